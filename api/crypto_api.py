@@ -1,7 +1,13 @@
 
+import asyncio
 import requests
 import logging
-from time import sleep
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from time import monotonic
+from utils import http_client
+from utils.tracing import span
 
 # Configure logger
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -9,9 +15,94 @@ logger = logging.getLogger(__name__)
 
 # Constants
 BASE_URL = "https://api.coincap.io/v2/assets"
-MAX_RETRIES = 3  # Number of retries
+MAX_RETRIES = 3  # Number of attempts per call
 TIMEOUT = 10  # Timeout for each request (in seconds)
-RETRY_DELAY = 2  # Delay between retries (in seconds)
+PRICE_CACHE_TTL = 10  # How long fetched coin data stays fresh (in seconds)
+PRICE_CACHE_MAX_SIZE = 256  # Maximum number of coins kept in the price cache
+MARKET_SNAPSHOT_TTL = 30  # How long the market table is served before a bulk refresh (in seconds)
+
+# Process-wide price cache: coin_name -> (fetched_at, data), kept in LRU order
+_price_cache = OrderedDict()
+_price_cache_lock = threading.Lock()
+_price_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+# Bumped every time a coin's data is refreshed from CoinCap
+_price_versions = {}
+# coin_name -> Future of the bulk fetch in progress for it, so concurrent misses share one request
+_in_flight = {}
+
+def _get_cached_coin(coin_name: str):
+    """
+    Returns fresh cached data for a coin, or None on a miss or an expired entry.
+    """
+    with _price_cache_lock:
+        entry = _price_cache.get(coin_name)
+        if entry is not None and monotonic() - entry[0] < PRICE_CACHE_TTL:
+            _price_cache.move_to_end(coin_name)
+            _price_cache_stats["hits"] += 1
+            return entry[1]
+        if entry is not None:
+            del _price_cache[coin_name]
+        _price_cache_stats["misses"] += 1
+        return None
+
+def _store_cached_coin(coin_name: str, data: dict) -> None:
+    """
+    Stores coin data in the price cache, evicting the least recently used entries.
+    """
+    with _price_cache_lock:
+        _price_cache[coin_name] = (monotonic(), data)
+        _price_versions[coin_name] = _price_versions.get(coin_name, 0) + 1
+        _price_cache.move_to_end(coin_name)
+        while len(_price_cache) > PRICE_CACHE_MAX_SIZE:
+            _price_cache.popitem(last=False)
+            _price_cache_stats["evictions"] += 1
+
+def cache_coins_data(coin_data: dict) -> None:
+    """
+    Stores already fetched coin data in the price cache, e.g. from a bulk market refresh.
+
+    Args:
+        coin_data (dict): A mapping of coin name to its data.
+    """
+    for coin_name, data in coin_data.items():
+        _store_cached_coin(coin_name.lower(), data)
+
+def get_snapshot_version(coin_names: list) -> tuple:
+    """
+    Returns a version identifying the price data currently cached for the given coins.
+    The version changes whenever any of the coins is refreshed from CoinCap.
+
+    Args:
+        coin_names (list): The names of the cryptocurrencies.
+
+    Returns:
+        tuple: Sorted (coin name, refresh count) pairs.
+    """
+    with _price_cache_lock:
+        return tuple(sorted((name, _price_versions.get(name, 0)) for name in coin_names))
+
+def get_price_cache_stats() -> dict:
+    """
+    Returns the price cache counters, useful for tuning PRICE_CACHE_TTL.
+
+    Returns:
+        dict: Hits, misses, evictions, hit rate and current cache size.
+    """
+    with _price_cache_lock:
+        stats = dict(_price_cache_stats)
+        stats["size"] = len(_price_cache)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+def clear_price_cache() -> None:
+    """
+    Drops all cached coin data and resets the cache counters.
+    """
+    with _price_cache_lock:
+        _price_cache.clear()
+        for key in _price_cache_stats:
+            _price_cache_stats[key] = 0
 
 def fetch_coin_data(coin_name: str) -> dict:
     """
@@ -23,22 +114,141 @@ def fetch_coin_data(coin_name: str) -> dict:
     Returns:
         dict: Data for the requested cryptocurrency or None if the API call fails.
     """
+    cached = _get_cached_coin(coin_name.lower())
+    if cached is not None:
+        logger.info(f"Price cache hit for {coin_name}.")
+        return cached
+
     url = f"{BASE_URL}/{coin_name.lower()}"
-    retries = 0
 
-    while retries < MAX_RETRIES:
-        try:
-            logger.info(f"Fetching data for {coin_name}, attempt {retries + 1}...")
-            response = requests.get(url, timeout=TIMEOUT)
-            response.raise_for_status()  # Raise HTTPError for bad responses
-            logger.info(f"Successfully fetched data for {coin_name}.")
-            return response.json().get("data", {})
-        except requests.exceptions.RequestException as e:
-            retries += 1
-            logger.error(f"Error fetching data for {coin_name}: {e}")
-            if retries < MAX_RETRIES:
-                logger.info(f"Retrying in {RETRY_DELAY} seconds...")
-                sleep(RETRY_DELAY)
+    try:
+        logger.info(f"Fetching data for {coin_name}...")
+        with span("coincap_fetch", coins=1):
+            response = http_client.request("GET", url, max_retries=MAX_RETRIES, timeout=TIMEOUT)
+        logger.info(f"Successfully fetched data for {coin_name}.")
+        data = response.json().get("data", {})
+        if data:
+            _store_cached_coin(coin_name.lower(), data)
+        return data
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error(f"Failed to fetch data for {coin_name}: {e}")
+        return None
+
+def _claim_fetches(coin_names: list, coin_data: dict) -> tuple:
+    """
+    Splits cache misses into coins this caller must fetch and coins another caller
+    is already fetching. Coins cached since the miss are added to `coin_data`.
+
+    Returns:
+        tuple: The coins to fetch, and a mapping of the other coins to their in-flight Future.
+    """
+    owned, waiting = [], {}
+    with _price_cache_lock:
+        for coin_name in coin_names:
+            entry = _price_cache.get(coin_name)
+            if entry is not None and monotonic() - entry[0] < PRICE_CACHE_TTL:
+                coin_data[coin_name] = entry[1]
+            elif coin_name in _in_flight:
+                waiting[coin_name] = _in_flight[coin_name]
             else:
-                logger.error(f"Failed to fetch data for {coin_name} after {MAX_RETRIES} attempts.")
-                return None
+                _in_flight[coin_name] = Future()
+                owned.append(coin_name)
+    return owned, waiting
+
+def _fetch_bulk(coin_names: list) -> dict:
+    """
+    Fetches the given coins in one CoinCap request and stores them in the price cache.
+    """
+    coin_data = {}
+    try:
+        logger.info(f"Fetching bulk data for {coin_names}...")
+        with span("coincap_fetch", coins=len(coin_names)):
+            response = http_client.request(
+                "GET", BASE_URL, params={"ids": ",".join(coin_names), "limit": len(coin_names)},
+                max_retries=MAX_RETRIES, timeout=TIMEOUT
+            )
+        for data in response.json().get("data", []):
+            coin_id = data.get("id")
+            if coin_id in coin_names:
+                _store_cached_coin(coin_id, data)
+                coin_data[coin_id] = data
+        logger.info(f"Successfully fetched bulk data for {coin_names}.")
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error(f"Failed to fetch bulk data for {coin_names}: {e}")
+    return coin_data
+
+def fetch_coins_data(coin_names: list) -> dict:
+    """
+    Fetches data for several coins from the CoinCap API in a single bulk request.
+    Coins with fresh entries in the price cache are served without a network call,
+    and coins another caller is already fetching wait for that request instead of
+    sending their own.
+
+    Args:
+        coin_names (list): The names of the cryptocurrencies.
+
+    Returns:
+        dict: A mapping of coin name to its data. Coins the API did not return are omitted.
+    """
+    coin_data = {}
+    missing = []
+    for coin_name in dict.fromkeys(name.lower() for name in coin_names):
+        cached = _get_cached_coin(coin_name)
+        if cached is not None:
+            coin_data[coin_name] = cached
+        else:
+            missing.append(coin_name)
+
+    if not missing:
+        logger.info(f"Price cache hit for all coins: {list(coin_data)}")
+        return coin_data
+
+    owned, waiting = _claim_fetches(missing, coin_data)
+    if owned:
+        fetched = {}
+        try:
+            fetched = _fetch_bulk(owned)
+            coin_data.update(fetched)
+        finally:
+            # Waiters get None for coins the API did not return, or if the fetch raised
+            with _price_cache_lock:
+                futures = [_in_flight.pop(coin_name) for coin_name in owned]
+            for coin_name, future in zip(owned, futures):
+                future.set_result(fetched.get(coin_name))
+
+    if waiting:
+        logger.info(f"Waiting for in-flight fetch of {list(waiting)}...")
+        for coin_name, future in waiting.items():
+            data = future.result()
+            if data:
+                coin_data[coin_name] = data
+    return coin_data
+
+def get_market_snapshot(coin_names: list, max_age: float = MARKET_SNAPSHOT_TTL) -> dict:
+    """
+    Returns data for every tracked coin. The market table in `market_table.py` is
+    the only market snapshot; this delegates to `get_market_data`, which refreshes
+    the table in one bulk request when it is older than `max_age`.
+
+    Args:
+        coin_names (list): The names of all tracked cryptocurrencies.
+        max_age (float): Maximum snapshot age before a refresh (in seconds).
+
+    Returns:
+        dict: A mapping of coin name to its data.
+    """
+    # Imported here because market_table imports this module
+    from api.market_table import get_market_data
+    return get_market_data(coin_names, max_age)
+
+async def fetch_coins_data_async(coin_names: list) -> dict:
+    """
+    Async variant of `fetch_coins_data`.
+
+    Args:
+        coin_names (list): The names of the cryptocurrencies.
+
+    Returns:
+        dict: A mapping of coin name to its data. Coins the API did not return are omitted.
+    """
+    return await asyncio.to_thread(fetch_coins_data, coin_names)
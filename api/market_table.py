@@ -0,0 +1,257 @@
+import math
+import asyncio
+import logging
+import threading
+from array import array
+from time import monotonic
+import requests
+from utils import http_client
+from utils.tracing import span
+from api.crypto_api import (
+    BASE_URL, MAX_RETRIES, TIMEOUT, PRICE_CACHE_TTL, MARKET_SNAPSHOT_TTL,
+    cache_coins_data, fetch_coins_data,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Constants
+MARKET_REFRESH_INTERVAL = PRICE_CACHE_TTL  # Time between two bulk refreshes of the market table (in seconds)
+MARKET_TABLE_MAX_AGE = MARKET_SNAPSHOT_TTL  # Older tables are not served; reads fall back to live fetches (in seconds)
+
+# Numeric CoinCap fields, each stored as one float64 column
+NUMERIC_COLUMNS = [
+    "rank", "priceUsd", "changePercent24Hr", "marketCapUsd",
+    "volumeUsd24Hr", "supply", "maxSupply", "vwap24Hr",
+]
+# Text CoinCap fields, each stored as one list
+TEXT_COLUMNS = ["symbol", "name", "explorer"]
+
+
+class MarketTable:
+    """
+    Immutable column-oriented table of CoinCap data for the tracked coins.
+
+    Every numeric field is an `array('d')` column indexed by row, with missing
+    values stored as NaN. A refresh builds a new table and swaps it in, so readers
+    never need a lock.
+    """
+
+    def __init__(self, coin_data: dict, fetched_at: float):
+        self.fetched_at = fetched_at
+        self.ids = list(coin_data)
+        self.rows = {coin_id: row for row, coin_id in enumerate(self.ids)}
+        self.numeric = {field: array("d") for field in NUMERIC_COLUMNS}
+        self.text = {field: [] for field in TEXT_COLUMNS}
+        for coin_id in self.ids:
+            data = coin_data[coin_id]
+            for field, column in self.numeric.items():
+                try:
+                    column.append(float(data.get(field)))
+                except (TypeError, ValueError):
+                    column.append(math.nan)
+            for field, column in self.text.items():
+                column.append(data.get(field))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def age(self) -> float:
+        return monotonic() - self.fetched_at
+
+    def row_data(self, coin_id: str) -> dict:
+        """
+        Returns one row as a CoinCap-style dict, or None if the coin is not in the table.
+        """
+        row = self.rows.get(coin_id)
+        if row is None:
+            return None
+        data = {"id": coin_id}
+        for field, column in self.numeric.items():
+            value = column[row]
+            if not math.isnan(value):
+                data[field] = str(int(value)) if field == "rank" else value
+        for field, column in self.text.items():
+            if column[row] is not None:
+                data[field] = column[row]
+        return data
+
+
+_market_table = None
+_refresher = {"thread": None, "stop": None}
+_refresher_lock = threading.Lock()
+_on_demand_refresh_lock = threading.Lock()  # Concurrent readers of a stale table share one refresh
+_market_table_stats = {"refreshes": 0, "refresh_failures": 0, "table_hits": 0, "live_fallbacks": 0}
+_market_table_stats_lock = threading.Lock()
+
+def _count(**increments) -> None:
+    with _market_table_stats_lock:
+        for key, value in increments.items():
+            _market_table_stats[key] += value
+
+def refresh_market_table(coin_names: list) -> bool:
+    """
+    Fetches all tracked coins in one bulk CoinCap request and swaps in a new market table.
+    The fetched data also primes the price cache.
+
+    Args:
+        coin_names (list): The names of all tracked cryptocurrencies.
+
+    Returns:
+        bool: True if the table was refreshed.
+    """
+    global _market_table
+    ids = list(dict.fromkeys(name.lower() for name in coin_names))
+    try:
+        with span("market_refresh", coins=len(ids)):
+            response = http_client.request(
+                "GET", BASE_URL, params={"ids": ",".join(ids), "limit": len(ids)},
+                max_retries=MAX_RETRIES, timeout=TIMEOUT
+            )
+        coin_data = {data["id"]: data for data in response.json().get("data", []) if data.get("id")}
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error(f"Failed to refresh market table: {e}")
+        _count(refresh_failures=1)
+        return False
+
+    if not coin_data:
+        logger.warning("Market table refresh returned no data.")
+        _count(refresh_failures=1)
+        return False
+
+    _market_table = MarketTable(coin_data, monotonic())
+    cache_coins_data(coin_data)
+    _count(refreshes=1)
+    logger.debug(f"Market table refreshed with {len(coin_data)} coins.")
+    return True
+
+def _refresh_loop(coin_names: list, interval: float, stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            refresh_market_table(coin_names)
+        except Exception as e:
+            logger.error(f"Unexpected error refreshing market table: {e}", exc_info=True)
+        stop.wait(interval)
+
+def start_market_refresher(coin_names: list, interval: float = MARKET_REFRESH_INTERVAL) -> None:
+    """
+    Starts a daemon thread that refreshes the market table every `interval` seconds.
+    Does nothing if the refresher is already running.
+
+    Args:
+        coin_names (list): The names of all tracked cryptocurrencies.
+        interval (float): Time between two refreshes (in seconds).
+    """
+    with _refresher_lock:
+        if _refresher["thread"] is not None and _refresher["thread"].is_alive():
+            return
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=_refresh_loop, args=(list(coin_names), interval, stop),
+            name="market-refresher", daemon=True
+        )
+        _refresher["thread"], _refresher["stop"] = thread, stop
+        thread.start()
+    logger.info(f"Market refresher started for {len(coin_names)} coins every {interval}s.")
+
+def stop_market_refresher(timeout: float = None) -> None:
+    """
+    Stops the background refresher and waits for its thread to exit.
+
+    Args:
+        timeout (float): Maximum time to wait (in seconds). Waits indefinitely if None.
+    """
+    with _refresher_lock:
+        thread, stop = _refresher["thread"], _refresher["stop"]
+        _refresher["thread"], _refresher["stop"] = None, None
+    if thread is not None:
+        stop.set()
+        thread.join(timeout)
+        logger.info("Market refresher stopped.")
+
+def get_market_table(max_age: float = MARKET_TABLE_MAX_AGE):
+    """
+    Returns the current market table, or None if there is none younger than `max_age` seconds.
+    """
+    table = _market_table
+    if table is None or table.age() >= max_age:
+        return None
+    return table
+
+def get_coins_data(coin_names: list, max_age: float = MARKET_TABLE_MAX_AGE) -> dict:
+    """
+    Returns data for the given coins from the market table without a network call.
+    Coins missing from the table, or all of them when it is stale, are fetched live.
+
+    Args:
+        coin_names (list): The names of the cryptocurrencies.
+        max_age (float): Maximum table age to serve from (in seconds).
+
+    Returns:
+        dict: A mapping of coin name to its data. Coins CoinCap did not return are omitted.
+    """
+    table = get_market_table(max_age)
+    coin_data = {}
+    missing = []
+    for coin_name in dict.fromkeys(name.lower() for name in coin_names):
+        data = table.row_data(coin_name) if table is not None else None
+        if data is not None:
+            coin_data[coin_name] = data
+        else:
+            missing.append(coin_name)
+
+    _count(table_hits=len(coin_data), live_fallbacks=len(missing))
+    if missing:
+        coin_data.update(fetch_coins_data(missing))
+    return coin_data
+
+async def get_coins_data_async(coin_names: list, max_age: float = MARKET_TABLE_MAX_AGE) -> dict:
+    """
+    Async variant of `get_coins_data`.
+    """
+    return await asyncio.to_thread(get_coins_data, coin_names, max_age)
+
+def get_market_data(coin_names: list, max_age: float = MARKET_TABLE_MAX_AGE) -> dict:
+    """
+    Returns data for every tracked coin from the market table. When the table is
+    missing or older than `max_age`, it is refreshed in one bulk request first;
+    concurrent callers share that refresh. If the refresh fails, the last table
+    is served as is.
+
+    Args:
+        coin_names (list): The names of all tracked cryptocurrencies.
+        max_age (float): Maximum table age to serve from (in seconds).
+
+    Returns:
+        dict: A mapping of coin name to its data. Empty if no table could be built.
+    """
+    table = get_market_table(max_age)
+    if table is None:
+        with _on_demand_refresh_lock:
+            table = get_market_table(max_age)
+            if table is None:
+                _count(live_fallbacks=len(coin_names))
+                refresh_market_table(coin_names)
+                table = _market_table
+        if table is None:
+            return {}
+    else:
+        _count(table_hits=len(table))
+    return {coin_id: table.row_data(coin_id) for coin_id in table.ids}
+
+def get_market_table_stats() -> dict:
+    """
+    Returns market table counters.
+
+    Returns:
+        dict: Refreshes, refresh failures, coins served from the table, live fallbacks,
+        table size and age (None when no table has been built yet).
+    """
+    with _market_table_stats_lock:
+        stats = dict(_market_table_stats)
+    table = _market_table
+    stats["size"] = len(table) if table is not None else 0
+    stats["age"] = table.age() if table is not None else None
+    stats["running"] = _refresher["thread"] is not None and _refresher["thread"].is_alive()
+    return stats
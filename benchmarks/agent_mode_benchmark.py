@@ -0,0 +1,109 @@
+"""
+Latency and accuracy of the two agent modes.
+
+Replays the user queries recorded under `prev_chats/` through the pipeline in
+"two_call" mode (extract coins, fetch, answer) and "single_call" mode (answer
+from the market snapshot in one LLM call). Calls the live CoinCap, Lecto and
+Together APIs, so the API keys must be configured.
+
+Accuracy is the share of (query, coin) pairs whose current CoinCap price appears
+in the answer within PRICE_TOLERANCE; the coins expected for a query are those the
+local coin matcher finds in it, and queries it can't resolve are skipped.
+
+Sessions are written to a temporary store, not the repository's `chroma_db`.
+
+Run from the repository root:
+    python -m benchmarks.agent_mode_benchmark [max_queries]
+"""
+import os
+import csv
+import glob
+import re
+import sys
+import uuid
+import tempfile
+from statistics import median
+from time import perf_counter
+
+from api.crypto_api import fetch_coins_data
+from benchmarks.offline_benchmark import CONVERSATIONS_PATTERN
+from chat import context_manager, pipeline, response_cache
+from chat.coin_matcher import match_coin_names
+
+PRICE_TOLERANCE = 0.01
+DEFAULT_MAX_QUERIES = 30
+
+_NUMBER_RE = re.compile(r"\$?\s?(\d[\d,]*\.?\d*)")
+
+
+def load_queries(limit: int) -> list:
+    queries = []
+    for path in sorted(glob.glob(CONVERSATIONS_PATTERN)):
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                queries.append(row["query"])
+    return queries[:limit]
+
+
+def mentions_price(answer: str, price: float) -> bool:
+    for match in _NUMBER_RE.findall(answer):
+        try:
+            value = float(match.replace(",", ""))
+        except ValueError:
+            continue
+        if price and abs(value - price) / price <= PRICE_TOLERANCE:
+            return True
+    return False
+
+
+def run_mode(mode: str, queries: list) -> dict:
+    pipeline.AGENT_MODE = mode
+    latencies, correct, checked = [], 0, 0
+    for query in queries:
+        session_id = f"bench_{uuid.uuid4().hex[:8]}"
+        start = perf_counter()
+        answer = pipeline.handle_query(query, session_id=session_id)
+        latencies.append(perf_counter() - start)
+        # The context write runs in the background; finish it outside the timed section
+        pipeline.wait_for_context_writes(session_id)
+
+        coins, confidence = match_coin_names(query)
+        if not coins or confidence < 0.8:
+            continue
+        prices = fetch_coins_data(coins)
+        for coin in coins:
+            if coin in prices:
+                checked += 1
+                correct += mentions_price(answer, float(prices[coin]["priceUsd"]))
+
+    latencies.sort()
+    return {
+        "p50": median(latencies),
+        "p95": latencies[int(0.95 * (len(latencies) - 1))],
+        "accuracy": correct / checked if checked else float("nan"),
+        "checked": checked,
+    }
+
+
+def main() -> None:
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_MAX_QUERIES
+    queries = load_queries(limit)
+    if not queries:
+        sys.exit(f"No recorded queries found matching {CONVERSATIONS_PATTERN}")
+    workdir = tempfile.mkdtemp(prefix="agent_mode_bench_")
+    context_manager.CHROMA_DB_DIR = os.path.join(workdir, "chroma_db")
+    context_manager.CSV_DB_DIR_BASE = os.path.join(workdir, "context_db")
+    context_manager.CONTEXT_LOG_DIR_BASE = os.path.join(workdir, "context_log")
+    # Every query should reach the LLM in both modes
+    response_cache.RESPONSE_CACHE_SIMILARITY = 2.0
+
+    print(f"{len(queries)} queries")
+    print(f"{'mode':<12} {'p50 s':>8} {'p95 s':>8} {'price accuracy':>16}")
+    for mode in ("two_call", "single_call"):
+        result = run_mode(mode, queries)
+        print(f"{mode:<12} {result['p50']:>8.2f} {result['p95']:>8.2f} "
+              f"{result['accuracy']:>10.1%} (n={result['checked']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Cold-start cost of the context manager.
+
+Each measurement runs in a fresh interpreter and reports wall time and peak
+resident memory for importing `chat.context_manager` alone, and for importing
+it and then calling `warmup()` (what the first query used to pay at import).
+The warmup probe points the context store at a temporary directory, so the
+repository's `chroma_db` is left untouched.
+
+Run from the repository root:
+    python -m benchmarks.cold_start_benchmark
+"""
+import json
+import subprocess
+import sys
+import tempfile
+
+# Points the context store at the probe's temporary directory; importing alone touches no files
+USE_WORKDIR = (
+    "cm.CHROMA_DB_DIR = os.path.join({workdir!r}, 'chroma_db'); "
+    "cm.CSV_DB_DIR_BASE = os.path.join({workdir!r}, 'context_db'); "
+    "cm.CONTEXT_LOG_DIR_BASE = os.path.join({workdir!r}, 'context_log')"
+)
+
+SCENARIOS = {
+    "import only": "import chat.context_manager",
+    "import + warmup": f"import chat.context_manager as cm; {USE_WORKDIR}; cm.warmup()",
+}
+
+PROBE = """
+import json, os, resource, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def main() -> None:
+    print(f"{'scenario':<18} {'seconds':>10} {'peak rss MB':>12}")
+    for name, code in SCENARIOS.items():
+        workdir = tempfile.mkdtemp(prefix="cold_start_bench_")
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(code=code.format(workdir=workdir))], capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{name:<18} {result['seconds']:>10.3f} {result['max_rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Context inserts per second as a session grows.
+
+Measures single `add_query_to_context` calls, the batched `add_queries_to_context`
+path, and the previous ID scheme that counted every stored document through
+`collection.get()` before each insert. Uses the hashing encoder from
+`benchmarks.fakes` so the model's forward pass is not measured, and a temporary
+store so the repository's `chroma_db` and context logs are left untouched.
+
+Run from the repository root:
+    python -m benchmarks.context_insert_benchmark
+"""
+import os
+import tempfile
+from time import perf_counter
+
+from benchmarks.fakes import HashingEncoder
+from chat import context_manager
+
+SESSION_SIZES = [100, 500, 1000, 2000, 5000]
+INSERTS_PER_SIZE = 100
+
+
+def legacy_insert(query: str) -> None:
+    collection = context_manager.get_context_manager().collection
+    embedding = context_manager.get_embedding_model().encode([query]).tolist()[0]
+    collection.add(
+        documents=[query],
+        embeddings=[embedding],
+        ids=[f"legacy_{len(collection.get()['documents']) + 1}"]
+    )
+
+
+def main() -> None:
+    workdir = tempfile.mkdtemp(prefix="context_insert_bench_")
+    context_manager.CHROMA_DB_DIR = os.path.join(workdir, "chroma_db")
+    context_manager.CSV_DB_DIR_BASE = os.path.join(workdir, "context_db")
+    context_manager.CONTEXT_LOG_DIR_BASE = os.path.join(workdir, "context_log")
+    context_manager._embedding_model = HashingEncoder()
+
+    print(f"{'turns':>8} {'single/s':>12} {'batch/s':>12} {'legacy id/s':>12}")
+    stored = 0
+    for size in SESSION_SIZES:
+        if stored < size:
+            context_manager.add_queries_to_context(
+                [(f"filler query {i}", f"filler response {i}") for i in range(stored, size)]
+            )
+            stored = size
+
+        start = perf_counter()
+        for i in range(INSERTS_PER_SIZE):
+            context_manager.add_query_to_context(f"single query {size}-{i}", "response")
+        single_rate = INSERTS_PER_SIZE / (perf_counter() - start)
+
+        start = perf_counter()
+        context_manager.add_queries_to_context(
+            [(f"batch query {size}-{i}", "response") for i in range(INSERTS_PER_SIZE)]
+        )
+        batch_rate = INSERTS_PER_SIZE / (perf_counter() - start)
+
+        start = perf_counter()
+        for i in range(INSERTS_PER_SIZE):
+            legacy_insert(f"legacy query {size}-{i}")
+        legacy_rate = INSERTS_PER_SIZE / (perf_counter() - start)
+
+        stored += 3 * INSERTS_PER_SIZE
+        print(f"{size:>8} {single_rate:>12.1f} {batch_rate:>12.1f} {legacy_rate:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Per-turn context retrieval cost as a session grows.
+
+Compares `retrieve_context_for_query` (in-memory store, lookup by entry ID) with
+the previous approach of re-reading the session CSV and scanning it for every hit.
+The embedding model is swapped for a cheap hashing encoder so the numbers reflect
+storage cost rather than the transformer forward pass.
+
+Run from the repository root:
+    python -m benchmarks.context_store_benchmark
+"""
+import tempfile
+import os
+from time import perf_counter
+
+import pandas as pd
+
+from benchmarks.fakes import HashingEncoder
+from chat import context_manager
+
+SESSION_SIZES = [10, 100, 500, 1000, 2000, 5000]
+TURNS_PER_SIZE = 50
+
+
+def legacy_lookup(csv_path: str, hits: list) -> list:
+    csv_db = pd.read_csv(csv_path)
+    entries = []
+    for retrieved_query in hits:
+        matching_row = csv_db[csv_db["query"] == retrieved_query]
+        if not matching_row.empty:
+            entries.append({"query": matching_row.iloc[0]["query"], "response": matching_row.iloc[0]["response"]})
+    return entries
+
+
+def main() -> None:
+    workdir = tempfile.mkdtemp(prefix="context_store_bench_")
+    context_manager.CHROMA_DB_DIR = os.path.join(workdir, "chroma_db")
+    context_manager.CSV_DB_DIR_BASE = os.path.join(workdir, "context_db")
+    context_manager.CONTEXT_LOG_DIR_BASE = os.path.join(workdir, "context_log")
+    context_manager._embedding_model = HashingEncoder()
+    csv_path = os.path.join(workdir, "legacy_context.csv")
+
+    print(f"{'turns':>8} {'store ms/turn':>15} {'legacy csv ms/turn':>20}")
+    stored = 0
+    for size in SESSION_SIZES:
+        while stored < size:
+            context_manager.add_query_to_context(f"what is the price of coin {stored}?", f"response {stored} " * 40)
+            stored += 1
+
+        queries = [f"what is the price of coin {i}?" for i in range(TURNS_PER_SIZE)]
+        start = perf_counter()
+        for query in queries:
+            context_manager.retrieve_context_for_query(query)
+        store_ms = (perf_counter() - start) * 1000 / TURNS_PER_SIZE
+
+        context_manager.export_context_to_csv(csv_path)
+        start = perf_counter()
+        for query in queries:
+            legacy_lookup(csv_path, [query, queries[0], queries[-1]])
+        legacy_ms = (perf_counter() - start) * 1000 / TURNS_PER_SIZE
+
+        print(f"{size:>8} {store_ms:>15.3f} {legacy_ms:>20.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Cost and retrieval quality of the embedding backends.
+
+Every candidate (model, runtime and optional model file) runs in a fresh
+interpreter, which loads it and encodes the queries recorded under
+`prev_chats/`. The benchmark reports load time, peak resident memory, per-query
+latency and batched throughput.
+
+Retrieval quality is measured against the current model (the first candidate):
+for every turn of every conversation, the top-k earlier turns by L2 distance
+(ChromaDB's default) are compared with those the reference model finds, for
+each storage dtype of the embedding cache. Recall 1.0 means the candidate
+would put exactly the same context in the prompt.
+
+Run from the repository root:
+    python -m benchmarks.embedding_benchmark
+    python -m benchmarks.embedding_benchmark --candidates 0 1 3 --top-k 3
+"""
+import os
+import sys
+import json
+import argparse
+import resource
+import subprocess
+import tempfile
+from time import perf_counter
+
+import numpy as np
+
+from benchmarks.offline_benchmark import load_conversations, percentile
+from chat.embedding_backends import STORAGE_DTYPES, dequantize, quantize, storage_row_dtype
+
+# (model, inference backend, model file); the first one is the reference
+CANDIDATES = [
+    ("distilbert-base-nli-stsb-mean-tokens", "torch", None),
+    ("sentence-transformers/all-MiniLM-L6-v2", "torch", None),
+    ("sentence-transformers/all-MiniLM-L6-v2", "onnx", None),
+    ("sentence-transformers/all-MiniLM-L6-v2", "onnx", "onnx/model_qint8_avx2.onnx"),
+    ("sentence-transformers/paraphrase-MiniLM-L3-v2", "torch", None),
+]
+
+
+def candidate_label(candidate: tuple) -> str:
+    model, backend, model_file = candidate
+    return f"{model.split('/')[-1]} [{backend}{', ' + os.path.basename(model_file) if model_file else ''}]"
+
+
+def run_worker(index: int, vectors_path: str, batch_size: int) -> None:
+    """
+    Loads one candidate, encodes every recorded query and prints its costs as JSON.
+    """
+    from chat.embedding_backends import load_embedding_backend
+
+    queries = [query for conversation in load_conversations() for query in conversation]
+    model, backend, model_file = CANDIDATES[index]
+
+    start = perf_counter()
+    encoder = load_embedding_backend(model, backend, batch_size, model_file)
+    encoder.encode(["warmup"])
+    load_seconds = perf_counter() - start
+    rss_after_load = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    latencies = []
+    for query in queries:
+        start = perf_counter()
+        encoder.encode([query])
+        latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    vectors = encoder.encode(queries)
+    batch_seconds = perf_counter() - start
+    np.save(vectors_path, vectors)
+
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        "max_rss_mb": rss_after_load,
+        "dim": int(vectors.shape[1]),
+        "query_p50_ms": percentile(latencies, 0.50) * 1000,
+        "query_p95_ms": percentile(latencies, 0.95) * 1000,
+        "batch_queries_per_s": len(queries) / batch_seconds,
+    }))
+
+
+def neighbours(vectors: np.ndarray, conversations: list, top_k: int) -> list:
+    """
+    Returns, for every turn after the first of each conversation, the indexes of
+    the `top_k` closest earlier turns of the same conversation.
+    """
+    results, offset = [], 0
+    for conversation in conversations:
+        session = vectors[offset:offset + len(conversation)]
+        for turn in range(1, len(conversation)):
+            distances = np.linalg.norm(session[:turn] - session[turn], axis=1)
+            results.append(set(np.argsort(distances, kind="stable")[:top_k].tolist()))
+        offset += len(conversation)
+    return results
+
+
+def recall(found: list, expected: list) -> float:
+    hits = sum(len(a & b) for a, b in zip(found, expected))
+    total = sum(len(b) for b in expected)
+    return hits / total if total else 1.0
+
+
+def roundtrip(vectors: np.ndarray, storage_dtype: str) -> np.ndarray:
+    return np.stack([dequantize(quantize(vector, storage_dtype)) for vector in vectors])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, nargs="+", default=list(range(len(CANDIDATES))),
+                        help="indexes into CANDIDATES; the reference (0) is always included")
+    parser.add_argument("--top-k", type=int, default=3, help="context entries retrieved per turn")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--vectors", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.worker is not None:
+        run_worker(args.worker, args.vectors, args.batch_size)
+        return
+
+    conversations = load_conversations()
+    print(f"Encoding {sum(map(len, conversations))} queries from {len(conversations)} conversations")
+
+    workdir = tempfile.mkdtemp(prefix="embedding_bench_")
+    results, reference = [], None
+    for index in dict.fromkeys([0] + args.candidates):
+        vectors_path = os.path.join(workdir, f"candidate_{index}.npy")
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.embedding_benchmark", "--worker", str(index),
+             "--vectors", vectors_path, "--batch-size", str(args.batch_size)],
+            capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            error = (completed.stderr.strip().splitlines() or ["no output"])[-1]
+            print(f"{candidate_label(CANDIDATES[index])}: failed ({error})")
+            if index == 0:
+                sys.exit(1)
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        vectors = np.load(vectors_path)
+        if reference is None:
+            reference = neighbours(vectors, conversations, args.top_k)
+
+        result["label"] = candidate_label(CANDIDATES[index])
+        result["recall"] = {
+            dtype: recall(neighbours(roundtrip(vectors, dtype), conversations, args.top_k), reference)
+            for dtype in STORAGE_DTYPES
+        }
+        result["bytes_per_vector"] = {dtype: storage_row_dtype(dtype, result["dim"]).itemsize for dtype in STORAGE_DTYPES}
+        results.append(result)
+
+    print(f"\n{'candidate':<58} {'load s':>7} {'rss MB':>8} {'p50 ms':>7} {'p95 ms':>7} {'batch q/s':>10}")
+    for result in results:
+        print(f"{result['label']:<58} {result['load_seconds']:>7.2f} {result['max_rss_mb']:>8.0f} "
+              f"{result['query_p50_ms']:>7.1f} {result['query_p95_ms']:>7.1f} {result['batch_queries_per_s']:>10.1f}")
+
+    print(f"\nrecall@{args.top_k} vs {results[0]['label']} (bytes per cached vector)")
+    print(f"{'candidate':<58} " + " ".join(f"{dtype:>16}" for dtype in STORAGE_DTYPES))
+    for result in results:
+        print(f"{result['label']:<58} " + " ".join(
+            f"{result['recall'][dtype]:>9.3f} ({result['bytes_per_vector'][dtype]:>4})" for dtype in STORAGE_DTYPES
+        ))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "candidates": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
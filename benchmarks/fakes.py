@@ -0,0 +1,206 @@
+"""
+Local stand-ins for CoinCap, Lecto, Together and the embedding model.
+
+The HTTP fakes are mounted as transport adapters on the pooled sessions of
+`utils.http_client`, so retries, the circuit breaker and connection pooling
+run exactly as they do against the real services. Every fake takes a
+`ServiceProfile` with the latency and error rate to inject.
+"""
+import json
+import random
+import hashlib
+import threading
+from time import sleep
+from types import SimpleNamespace
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import requests
+from requests.adapters import BaseAdapter
+
+from chat.coin_matcher import VALID_CRYPTOS, TICKERS, match_coin_names
+
+EMBEDDING_DIM = 768
+
+
+class ServiceProfile:
+    """
+    Latency and failure behaviour of one fake service.
+
+    Latency is drawn uniformly from [latency - jitter, latency + jitter] seconds.
+    A failing HTTP call returns `error_status`; a failing LLM call raises.
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, error_rate: float = 0.0, error_status: int = 503):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def wait(self) -> None:
+        sleep(max(0.0, random.uniform(self.latency - self.jitter, self.latency + self.jitter)))
+
+    def fails(self) -> bool:
+        return random.random() < self.error_rate
+
+
+def _json_response(request, status_code: int, payload) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(payload).encode()
+    response.headers["Content-Type"] = "application/json"
+    response.url = request.url
+    response.request = request
+    response.encoding = "utf-8"
+    return response
+
+
+def fake_asset(coin_id: str) -> dict:
+    """
+    Returns deterministic CoinCap-style data for a coin, with a price that drifts slightly per call.
+    """
+    seed = int.from_bytes(hashlib.md5(coin_id.encode()).digest()[:4], "little")
+    rank = VALID_CRYPTOS.index(coin_id) + 1 if coin_id in VALID_CRYPTOS else 500
+    price = (seed % 100_000) / 10 * random.uniform(0.999, 1.001)
+    supply = 1e6 + seed % 1e9
+    return {
+        "id": coin_id,
+        "rank": str(rank),
+        "symbol": TICKERS.get(coin_id, coin_id[:4]).upper(),
+        "name": coin_id.replace("-", " ").title(),
+        "supply": str(supply),
+        "maxSupply": None,
+        "marketCapUsd": str(price * supply),
+        "volumeUsd24Hr": str(price * supply * 0.03),
+        "priceUsd": str(price),
+        "changePercent24Hr": str(random.uniform(-5, 5)),
+        "vwap24Hr": str(price),
+        "explorer": f"https://example.com/{coin_id}",
+    }
+
+
+class FakeCoinCapAdapter(BaseAdapter):
+    """
+    Serves `/v2/assets/<id>` and `/v2/assets?ids=...` like CoinCap.
+    """
+
+    def __init__(self, profile: ServiceProfile):
+        super().__init__()
+        self.profile = profile
+
+    def send(self, request, **kwargs):
+        self.profile.wait()
+        if self.profile.fails():
+            return _json_response(request, self.profile.error_status, {"error": "injected"})
+        parts = urlsplit(request.url)
+        path = parts.path.rstrip("/").split("/")
+        if path[-1] != "assets":
+            if path[-1] not in VALID_CRYPTOS:
+                return _json_response(request, 404, {"error": f"{path[-1]} not found"})
+            return _json_response(request, 200, {"data": fake_asset(path[-1])})
+        ids = parse_qs(parts.query).get("ids", [""])[0].split(",")
+        return _json_response(request, 200, {"data": [fake_asset(i) for i in ids if i in VALID_CRYPTOS]})
+
+    def close(self):
+        pass
+
+
+class FakeLectoAdapter(BaseAdapter):
+    """
+    Serves the Lecto translate endpoint, returning each text unchanged.
+    """
+
+    def __init__(self, profile: ServiceProfile):
+        super().__init__()
+        self.profile = profile
+
+    def send(self, request, **kwargs):
+        self.profile.wait()
+        if self.profile.fails():
+            return _json_response(request, self.profile.error_status, {"error": "injected"})
+        texts = json.loads(request.body).get("texts", [])
+        return _json_response(request, 200, {"translations": list(texts)})
+
+    def close(self):
+        pass
+
+
+def install_http_fakes(coincap: ServiceProfile, lecto: ServiceProfile) -> None:
+    """
+    Routes all CoinCap and Lecto traffic of `utils.http_client` to the fakes.
+    """
+    from api.crypto_api import BASE_URL
+    from utils import http_client
+    from utils.translation import LECTO_URL
+
+    http_client.get_session(BASE_URL).mount("https://", FakeCoinCapAdapter(coincap))
+    http_client.get_session(LECTO_URL).mount("https://", FakeLectoAdapter(lecto))
+
+
+class FakeTogether:
+    """
+    Stand-in for the Together client used by `chat.llm_agent`.
+
+    Extraction calls answer with the coins the local matcher finds; answer calls
+    echo the coin data they were given, `tokens_per_second` tokens at a time when streaming.
+    """
+
+    def __init__(self, profile: ServiceProfile, tokens_per_second: float = 200.0):
+        self.profile = profile
+        self.tokens_per_second = tokens_per_second
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _answer(self, messages: list) -> str:
+        contents = [message["content"] for message in messages]
+        if "currencies_mentioned" in contents[0]:
+            coins, _ = match_coin_names(contents[-1])
+            return json.dumps({"currencies_mentioned": coins})
+        data = [content for content in contents if content.startswith(("Coin Data:", "Market Data:"))]
+        return f"Here is what I found. {' '.join(data)[:600]} Let me know if you need anything else."
+
+    def create(self, model: str, messages: list, stream: bool = False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        self.profile.wait()
+        if self.profile.fails():
+            raise RuntimeError("Injected Together failure")
+        text = self._answer(messages)
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+        return self._stream(text)
+
+    def _stream(self, text: str):
+        for word in text.split(" "):
+            sleep(1 / self.tokens_per_second)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))])
+
+
+def install_llm_fake(profile: ServiceProfile, tokens_per_second: float = 200.0) -> FakeTogether:
+    """
+    Replaces the Together client of `chat.llm_agent` with a `FakeTogether`.
+    """
+    from chat import llm_agent
+
+    fake = FakeTogether(profile, tokens_per_second)
+    llm_agent.client = fake
+    return fake
+
+
+class HashingEncoder:
+    """
+    Deterministic stand-in for the SentenceTransformer, with an optional per-batch delay.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def encode(self, texts):
+        if self.latency:
+            sleep(self.latency)
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.md5(text.encode()).digest()[:4], "little")
+            vectors.append(np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32))
+        return np.stack(vectors)
@@ -0,0 +1,189 @@
+"""
+Offline end-to-end benchmark of the chatbot pipeline.
+
+Replays the recorded conversations under `prev_chats/` through
+`chat.pipeline.handle_query` (what `handle_user_input` in the Streamlit app
+calls) with CoinCap, Lecto and Together replaced by the local fakes in
+`benchmarks.fakes`. Latency and error rates of every fake are configurable,
+and the embedding model is replaced by a hashing encoder unless
+--real-embeddings is given. No network access is needed.
+
+Each conversation runs in its own session, turn by turn. For every concurrency
+level, that many conversations run at the same time, and the benchmark reports
+throughput, per-turn latency and per-stage p50/p95/p99 from `utils.tracing`.
+
+Run from the repository root:
+    python -m benchmarks.offline_benchmark --concurrency 1 4 16 --llm-latency 0.3 --coincap-errors 0.05
+    python -m benchmarks.offline_benchmark --json results.json --max-p95 2.0   # fails with exit code 1 on regression
+"""
+import os
+import csv
+import sys
+import glob
+import json
+import uuid
+import argparse
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from benchmarks.fakes import HashingEncoder, ServiceProfile, install_http_fakes, install_llm_fake
+from chat import context_manager
+
+# Recorded conversations, found relative to the repository rather than the working directory
+CONVERSATIONS_PATTERN = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prev_chats", "context_db_session_*.csv"
+)
+
+REPORTED_STAGES = [
+    "query", "translate", "lecto_request", "embed", "vector_query", "coin_extraction",
+    "llm_extraction", "coincap_fetch", "generation", "context_write",
+]
+
+
+def load_conversations(pattern: str = CONVERSATIONS_PATTERN) -> list:
+    conversations = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, newline="") as f:
+            queries = [row["query"] for row in csv.DictReader(f) if row["query"].strip()]
+        if queries:
+            conversations.append(queries)
+    return conversations
+
+
+def reset_caches() -> None:
+    """
+    Clears process-wide caches so every concurrency level starts cold.
+    """
+    from api import crypto_api
+    from chat import response_cache
+    from utils import translation
+
+    crypto_api.clear_price_cache()
+    with response_cache._response_cache_lock:
+        response_cache._response_cache.clear()
+    with translation._translation_cache_lock:
+        translation._translation_cache.clear()
+
+
+def run_conversation(queries: list) -> list:
+    from chat.pipeline import handle_query, wait_for_context_writes
+
+    session_id = f"bench_{uuid.uuid4().hex[:8]}"
+    latencies = []
+    for query in queries:
+        start = perf_counter()
+        handle_query(query, session_id=session_id)
+        latencies.append(perf_counter() - start)
+    wait_for_context_writes(session_id)
+    return latencies
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def run_level(conversations: list, concurrency: int, rounds: int) -> dict:
+    from utils.tracing import get_stage_stats, reset_stage_metrics
+
+    reset_caches()
+    reset_stage_metrics()
+    workload = conversations * rounds
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = [latency for result in executor.map(run_conversation, workload) for latency in result]
+    elapsed = perf_counter() - start
+
+    stages = get_stage_stats()
+    return {
+        "concurrency": concurrency,
+        "turns": len(latencies),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "stages": {stage: stages[stage] for stage in REPORTED_STAGES if stage in stages},
+    }
+
+
+def print_level(result: dict) -> None:
+    print(f"\nconcurrency {result['concurrency']}: {result['turns']} turns in {result['seconds']:.2f}s "
+          f"({result['throughput']:.1f} turns/s), turn p50 {result['p50']:.3f}s "
+          f"p95 {result['p95']:.3f}s p99 {result['p99']:.3f}s")
+    print(f"  {'stage':<16} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, stats in result["stages"].items():
+        print(f"  {stage:<16} {stats['count']:>7} {stats['p50'] * 1000:>9.1f} "
+              f"{stats['p95'] * 1000:>9.1f} {stats['p99'] * 1000:>9.1f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--rounds", type=int, default=1, help="times each conversation is replayed per level")
+    parser.add_argument("--coincap-latency", type=float, default=0.08)
+    parser.add_argument("--coincap-errors", type=float, default=0.0)
+    parser.add_argument("--lecto-latency", type=float, default=0.15)
+    parser.add_argument("--lecto-errors", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    parser.add_argument("--llm-errors", type=float, default=0.0)
+    parser.add_argument("--embed-latency", type=float, default=0.01, help="delay per encode batch of the hashing encoder")
+    parser.add_argument("--real-embeddings", action="store_true", help="use the real SentenceTransformer")
+    parser.add_argument("--agent-mode", choices=["two_call", "single_call"], default=None)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--max-p95", type=float, help="exit with code 1 if any level's turn p95 exceeds this (in seconds)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    workdir = tempfile.mkdtemp(prefix="chatbot_bench_")
+    context_manager.CHROMA_DB_DIR = os.path.join(workdir, "chroma_db")
+    context_manager.CSV_DB_DIR_BASE = os.path.join(workdir, "context_db")
+    context_manager.CONTEXT_LOG_DIR_BASE = os.path.join(workdir, "context_log")
+    if not args.real_embeddings:
+        context_manager._embedding_model = HashingEncoder(args.embed_latency)
+
+    install_http_fakes(
+        ServiceProfile(args.coincap_latency, args.coincap_latency / 3, args.coincap_errors),
+        ServiceProfile(args.lecto_latency, args.lecto_latency / 3, args.lecto_errors),
+    )
+    fake_llm = install_llm_fake(ServiceProfile(args.llm_latency, args.llm_latency / 3, args.llm_errors))
+
+    from chat import pipeline
+    if args.agent_mode:
+        pipeline.AGENT_MODE = args.agent_mode
+
+    conversations = load_conversations()
+    if not conversations:
+        sys.exit(f"No recorded conversations found matching {CONVERSATIONS_PATTERN}")
+    print(f"Replaying {len(conversations)} conversations ({sum(map(len, conversations))} turns) "
+          f"x{args.rounds} in {pipeline.AGENT_MODE} mode")
+
+    results = []
+    for concurrency in args.concurrency:
+        result = run_level(conversations, concurrency, args.rounds)
+        results.append(result)
+        print_level(result)
+
+    base = results[0]["throughput"]
+    print("\nscaling: " + ", ".join(
+        f"{r['concurrency']}x -> {r['throughput'] / base:.2f}x throughput" for r in results
+    ))
+    print(f"LLM calls: {fake_llm.calls}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "levels": results}, f, indent=2)
+
+    if args.max_p95 is not None and any(r["p95"] > args.max_p95 for r in results):
+        print(f"Turn p95 exceeded {args.max_p95}s.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
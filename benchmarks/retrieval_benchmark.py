@@ -0,0 +1,179 @@
+"""
+Context retrieval quality and latency: ChromaDB vs the in-process session index.
+
+Quality is measured by replaying the recorded conversations under `prev_chats/`.
+At every turn, each method retrieves the top-k earlier turns of the same
+conversation. A turn is labelled with the coins its recorded response discussed,
+which the retrieval methods never see. An earlier turn is relevant when its
+response discussed one of the same coins, and a turn scores a hit when any
+relevant turn is retrieved. Turns with no relevant earlier turn are skipped.
+Hit rates are reported separately for:
+
+- follow-ups, whose query names no coin (e.g. "what about its price now?");
+- coin turns, whose query names a coin.
+
+Latency is measured per query on the recorded sessions and on synthetic
+sessions of growing size.
+
+Run from the repository root:
+    python -m benchmarks.retrieval_benchmark
+    python -m benchmarks.retrieval_benchmark --hashing   # no model download; quality numbers are meaningless
+"""
+import os
+import csv
+import sys
+import glob
+import argparse
+import logging
+import tempfile
+from time import perf_counter
+
+import numpy as np
+
+from benchmarks.offline_benchmark import CONVERSATIONS_PATTERN, percentile
+from chat import context_manager
+from chat.coin_matcher import match_coin_names
+from chat.session_index import SessionIndex, entry_coins
+
+SYNTHETIC_SIZES = [10, 50, 100, 250, 500]
+SYNTHETIC_QUERIES = 50
+
+
+def load_turns(pattern: str = CONVERSATIONS_PATTERN) -> list:
+    """
+    Returns every recorded conversation as a list of (query, response) pairs.
+    """
+    conversations = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, newline="") as f:
+            turns = [(row["query"], row["response"]) for row in csv.DictReader(f) if row["query"].strip()]
+        if turns:
+            conversations.append(turns)
+    return conversations
+
+
+def response_coins(response: str) -> frozenset:
+    """
+    Returns the coins a recorded response discussed, used as the turn's relevance label.
+    """
+    coins, _ = match_coin_names(response)
+    return frozenset(coins)
+
+
+def chroma_search(collection, vector, top_k: int) -> list:
+    return collection.query(query_embeddings=[vector], n_results=top_k)["ids"][0]
+
+
+def replay(conversations: list, top_k: int) -> dict:
+    """
+    Replays every conversation turn by turn and scores each method against the
+    coins the recorded responses discussed.
+    """
+    methods = {
+        "chroma (similarity)": None,
+        "numpy (similarity)": dict(recency_weight=0.0, coin_weight=0.0),
+        "numpy (hybrid)": {},
+    }
+    results = {name: {"follow_up": [0, 0], "coin": [0, 0], "latencies": []} for name in methods}
+    client = context_manager.get_chroma_client()
+
+    for number, turns in enumerate(conversations):
+        queries = [query for query, _ in turns]
+        labels = [response_coins(response) for _, response in turns]
+        vectors = context_manager.embed_texts(queries)
+        entry_ids = [f"turn_{i}" for i in range(len(queries))]
+        collection = client.create_collection(name=f"replay_{number}")
+        indexes = {name: SessionIndex(**weights) for name, weights in methods.items() if weights is not None}
+
+        for turn, (query, vector) in enumerate(zip(queries, vectors)):
+            relevant = {i for i in range(turn) if labels[i] & labels[turn]}
+            if relevant:
+                kind = "coin" if entry_coins(query) else "follow_up"
+                for name in methods:
+                    start = perf_counter()
+                    if name.startswith("chroma"):
+                        hits = chroma_search(collection, vector, min(top_k, turn))
+                    else:
+                        hits = indexes[name].search(vector, query, top_k)
+                    results[name]["latencies"].append(perf_counter() - start)
+
+                    rows = {entry_ids.index(hit) for hit in hits}
+                    results[name][kind][0] += bool(rows & relevant)
+                    results[name][kind][1] += 1
+
+            collection.add(documents=[query], embeddings=[vector], ids=[entry_ids[turn]])
+            for index in indexes.values():
+                index.add([entry_ids[turn]], [vector], [query])
+    return results
+
+
+def synthetic_latency(dim: int, top_k: int) -> list:
+    """
+    Times a search in ChromaDB and in the session index for sessions of growing size.
+    """
+    rng = np.random.default_rng(0)
+    client = context_manager.get_chroma_client()
+    rows = []
+    for size in SYNTHETIC_SIZES:
+        vectors = rng.standard_normal((size, dim)).astype(np.float32)
+        entry_ids = [f"turn_{i}" for i in range(size)]
+        queries = [f"what is the price of coin {i}?" for i in range(size)]
+        collection = client.create_collection(name=f"synthetic_{size}")
+        collection.add(documents=queries, embeddings=vectors.tolist(), ids=entry_ids)
+        index = SessionIndex()
+        index.add(entry_ids, vectors, queries)
+
+        probes = rng.standard_normal((SYNTHETIC_QUERIES, dim)).astype(np.float32)
+        timings = {"chroma": [], "numpy": []}
+        for probe in probes:
+            start = perf_counter()
+            chroma_search(collection, probe.tolist(), min(top_k, size))
+            timings["chroma"].append(perf_counter() - start)
+            start = perf_counter()
+            index.search(probe, "and its volume?", top_k)
+            timings["numpy"].append(perf_counter() - start)
+        rows.append((size, percentile(timings["chroma"], 0.5), percentile(timings["numpy"], 0.5)))
+    return rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--hashing", action="store_true", help="use the hashing encoder instead of the real model")
+    args = parser.parse_args()
+    if args.top_k <= 0:
+        parser.error("--top-k must be positive")
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    context_manager.CHROMA_DB_DIR = os.path.join(tempfile.mkdtemp(prefix="retrieval_bench_"), "chroma_db")
+    if args.hashing:
+        from benchmarks.fakes import HashingEncoder
+        context_manager._embedding_model = HashingEncoder()
+
+    conversations = load_turns()
+    if not conversations:
+        sys.exit(f"No recorded conversations found matching {CONVERSATIONS_PATTERN}")
+    print(f"Replaying {len(conversations)} conversations ({sum(map(len, conversations))} turns), top_k={args.top_k}")
+    results = replay(conversations, args.top_k)
+
+    print(f"\n{'method':<22} {'follow-up hit':>14} {'coin hit':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, result in results.items():
+        follow_up = result["follow_up"][0] / result["follow_up"][1] if result["follow_up"][1] else 0.0
+        coin = result["coin"][0] / result["coin"][1] if result["coin"][1] else 0.0
+        print(f"{name:<22} {follow_up:>14.3f} {coin:>10.3f} "
+              f"{percentile(result['latencies'], 0.5) * 1000:>8.2f} {percentile(result['latencies'], 0.95) * 1000:>8.2f}")
+    first = next(iter(results.values()))
+    print(f"({first['follow_up'][1]} follow-up turns, {first['coin'][1]} coin turns)")
+
+    dim = len(context_manager.embed_texts(["dimension probe"])[0])
+    print(f"\n{'session size':>12} {'chroma p50 ms':>14} {'numpy p50 ms':>13}")
+    for size, chroma_ms, numpy_ms in synthetic_latency(dim, args.top_k):
+        print(f"{size:>12} {chroma_ms * 1000:>14.2f} {numpy_ms * 1000:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
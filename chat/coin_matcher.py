@@ -0,0 +1,261 @@
+import re
+import logging
+import threading
+from difflib import SequenceMatcher, get_close_matches
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# List of valid cryptocurrency names (CoinCap asset IDs)
+VALID_CRYPTOS = [
+    'bitcoin', 'ethereum', 'tether', 'solana', 'binance-coin', 'dogecoin', 'xrp', 'usd-coin', 'steth',
+    'cardano', 'tron', 'avalanche', 'shiba-inu', 'wrapped-bitcoin', 'chainlink', 'bitcoin-cash', 'polkadot',
+    'near-protocol', 'unus-sed-leo', 'litecoin', 'stellar', 'multi-collateral-dai', 'uniswap', 'sp8de',
+    'internet-computer', 'crypto-com-coin', 'ethereum-classic', 'fetch', 'stacks', 'monero', 'okb', 'filecoin',
+    'aave', 'vechain', 'fantom', 'the-graph', 'injective-protocol', 'thorchain', 'mantra-dao', 'raydium',
+    'algorand', 'theta', 'cosmos', 'bitcoin-sv', 'maker', 'hedera-hashgraph', 'kucoin-token', 'arweave',
+    'lido-dao', 'gala', 'flow', 'helium', 'eos', 'quant', 'polygon', 'gatetoken', 'ecash', 'neo', 'axie-infinity',
+    'pendle', 'aioz-network', 'the-sandbox', 'akash-network', 'tezos', 'nexo', 'mina', 'decentraland',
+    'elrond-egld', 'conflux-network', 'zcash', 'gnosis-gno', 'superfarm', 'chiliz', 'ftx-token', 'nervos-network',
+    'oasis-network', 'iota', 'pancakeswap', 'dexe', 'xinfin-network', 'kava', 'trueusd', 'compound', 'wootrade',
+    'nxm', 'theta-fuel', 'curve-dao-token', 'trust-wallet-token', 'amp', '1inch', 'livepeer', 'iotex',
+    'synthetix-network-token', 'reserve-rights', 'zilliqa', 'holo', 'celo', 'golem-network-tokens', 'dash', 'kusama'
+]
+
+# Tickers for each coin
+TICKERS = {
+    'bitcoin': 'btc', 'ethereum': 'eth', 'tether': 'usdt', 'solana': 'sol', 'binance-coin': 'bnb',
+    'dogecoin': 'doge', 'xrp': 'xrp', 'usd-coin': 'usdc', 'steth': 'steth', 'cardano': 'ada', 'tron': 'trx',
+    'avalanche': 'avax', 'shiba-inu': 'shib', 'wrapped-bitcoin': 'wbtc', 'chainlink': 'link',
+    'bitcoin-cash': 'bch', 'polkadot': 'dot', 'near-protocol': 'near', 'unus-sed-leo': 'leo',
+    'litecoin': 'ltc', 'stellar': 'xlm', 'multi-collateral-dai': 'dai', 'uniswap': 'uni', 'sp8de': 'spx',
+    'internet-computer': 'icp', 'crypto-com-coin': 'cro', 'ethereum-classic': 'etc', 'fetch': 'fet',
+    'stacks': 'stx', 'monero': 'xmr', 'okb': 'okb', 'filecoin': 'fil', 'aave': 'aave', 'vechain': 'vet',
+    'fantom': 'ftm', 'the-graph': 'grt', 'injective-protocol': 'inj', 'thorchain': 'rune', 'mantra-dao': 'om',
+    'raydium': 'ray', 'algorand': 'algo', 'theta': 'theta', 'cosmos': 'atom', 'bitcoin-sv': 'bsv',
+    'maker': 'mkr', 'hedera-hashgraph': 'hbar', 'kucoin-token': 'kcs', 'arweave': 'ar', 'lido-dao': 'ldo',
+    'gala': 'gala', 'flow': 'flow', 'helium': 'hnt', 'eos': 'eos', 'quant': 'qnt', 'polygon': 'matic',
+    'gatetoken': 'gt', 'ecash': 'xec', 'neo': 'neo', 'axie-infinity': 'axs', 'pendle': 'pendle',
+    'aioz-network': 'aioz', 'the-sandbox': 'sand', 'akash-network': 'akt', 'tezos': 'xtz', 'nexo': 'nexo',
+    'mina': 'mina', 'decentraland': 'mana', 'elrond-egld': 'egld', 'conflux-network': 'cfx', 'zcash': 'zec',
+    'gnosis-gno': 'gno', 'superfarm': 'super', 'chiliz': 'chz', 'ftx-token': 'ftt', 'nervos-network': 'ckb',
+    'oasis-network': 'rose', 'iota': 'miota', 'pancakeswap': 'cake', 'dexe': 'dexe', 'xinfin-network': 'xdc',
+    'kava': 'kava', 'trueusd': 'tusd', 'compound': 'comp', 'wootrade': 'woo', 'nxm': 'nxm',
+    'theta-fuel': 'tfuel', 'curve-dao-token': 'crv', 'trust-wallet-token': 'twt', 'amp': 'amp',
+    '1inch': '1inch', 'livepeer': 'lpt', 'iotex': 'iotx', 'synthetix-network-token': 'snx',
+    'reserve-rights': 'rsr', 'zilliqa': 'zil', 'holo': 'hot', 'celo': 'celo', 'golem-network-tokens': 'glm',
+    'dash': 'dash', 'kusama': 'ksm',
+}
+
+# Common names and nicknames that differ from the asset ID
+EXTRA_ALIASES = {
+    'ethereum': ['ether', 'eth2'],
+    'tether': ['usd tether'],
+    'binance-coin': ['binance', 'binance coin'],
+    'dogecoin': ['doge coin'],
+    'xrp': ['ripple'],
+    'usd-coin': ['usd coin'],
+    'steth': ['lido staked ether', 'staked ether'],
+    'avalanche': ['avalanche coin'],
+    'shiba-inu': ['shiba', 'shiba inu coin', 'shib inu'],
+    'wrapped-bitcoin': ['wrapped bitcoin'],
+    'bitcoin-cash': ['bitcoin cash', 'bitcoincash'],
+    'polkadot': ['polka dot'],
+    'near-protocol': ['near protocol'],
+    'unus-sed-leo': ['unus sed leo'],
+    'multi-collateral-dai': ['makerdao dai'],
+    'internet-computer': ['internet computer'],
+    'crypto-com-coin': ['cronos', 'crypto com coin', 'crypto com'],
+    'ethereum-classic': ['ethereum classic'],
+    'fetch': ['fetch ai', 'fetchai'],
+    'the-graph': ['the graph'],
+    'injective-protocol': ['injective'],
+    'mantra-dao': ['mantra', 'mantra dao'],
+    'bitcoin-sv': ['bitcoin sv', 'bitcoin satoshi vision'],
+    'hedera-hashgraph': ['hedera', 'hashgraph'],
+    'kucoin-token': ['kucoin', 'kucoin token'],
+    'lido-dao': ['lido', 'lido dao'],
+    'gatetoken': ['gate token'],
+    'axie-infinity': ['axie', 'axie infinity'],
+    'aioz-network': ['aioz network'],
+    'the-sandbox': ['sandbox'],
+    'akash-network': ['akash'],
+    'decentraland': ['decentraland mana'],
+    'elrond-egld': ['elrond', 'multiversx'],
+    'conflux-network': ['conflux'],
+    'gnosis-gno': ['gnosis'],
+    'ftx-token': ['ftx', 'ftx token'],
+    'nervos-network': ['nervos'],
+    'oasis-network': ['oasis'],
+    'xinfin-network': ['xinfin', 'xdc network'],
+    'curve-dao-token': ['curve', 'curve dao'],
+    'trust-wallet-token': ['trust wallet', 'trust wallet token'],
+    'synthetix-network-token': ['synthetix'],
+    'reserve-rights': ['reserve rights'],
+    'golem-network-tokens': ['golem'],
+    'polygon': ['matic network'],
+    'superfarm': ['super farm'],
+}
+
+# Aliases that are also everyday English; single words only count when written as an uppercase
+# ticker, phrases only when every word is capitalized (e.g. "The Graph")
+AMBIGUOUS_ALIASES = {
+    'the graph', 'sandbox', 'trust wallet', 'internet computer', 'link', 'dot', 'near', 'leo', 'uni', 'ray', 'theta', 'atom', 'ar', 'om', 'gala', 'flow', 'quant', 'neo',
+    'sand', 'mina', 'mana', 'super', 'rose', 'cake', 'kava', 'comp', 'woo', 'amp', 'hot', 'dash', 'stacks',
+    'maker', 'cosmos', 'stellar', 'compound', 'curve', 'oasis', 'holo', 'helium', 'fetch', 'gt', 'eos', 'sol',
+    'etc', 'algo', 'vet', 'rune', 'fil', 'ada', 'iota',
+}
+
+# Aliases shared with non-crypto instruments (SPX is also the S&P 500); the LLM always confirms them
+LLM_CONFIRMED_ALIASES = {'spx'}
+
+# Words that refer back to earlier turns; the LLM needs the context to resolve them
+REFERENTIAL_WORDS = {
+    'it', 'its', 'they', 'them', 'their', 'those', 'these', 'both', 'same', 'previous', 'above', 'earlier',
+    'former', 'latter', 'other', 'others',
+}
+
+# Common words that must never be fuzzy-matched onto a coin name
+FUZZY_STOPWORDS = {
+    'other', 'either', 'neither', 'whether', 'another', 'about', 'there', 'their', 'these', 'those', 'price',
+    'prices', 'today', 'market', 'value', 'latest', 'current', 'compare', 'coins', 'token', 'tokens', 'crypto',
+    'cryptocurrency', 'cryptocurrencies', 'ranking', 'change', 'volume', 'supply', 'please', 'would', 'could',
+    'should', 'where', 'hello', 'thanks', 'information', 'details', 'higher', 'lower', 'better', 'together',
+}
+
+FUZZY_MIN_LENGTH = 5  # Shortest word considered for fuzzy matching
+FUZZY_CUTOFF = 0.8  # Minimum difflib similarity ratio for a fuzzy match
+FUZZY_MAX_CONFIDENCE = 0.7  # Fuzzy matches stay below FAST_PATH_MIN_CONFIDENCE, so the LLM confirms them
+FAST_PATH_MIN_CONFIDENCE = 0.8  # Below this the caller should fall back to the LLM
+MAX_ALIAS_WORDS = 4  # Longest alias phrase, in words
+
+_WORD_RE = re.compile(r"[A-Za-z0-9]+")
+
+def _build_alias_index() -> dict:
+    index = {}
+    for coin in VALID_CRYPTOS:
+        aliases = {coin.replace('-', ' '), coin.replace('-', ''), TICKERS.get(coin, coin)}
+        aliases.update(EXTRA_ALIASES.get(coin, []))
+        for alias in aliases:
+            index.setdefault(alias, coin)
+    return index
+
+# Built once at import time
+ALIAS_INDEX = _build_alias_index()
+_TICKER_SET = set(TICKERS.values())
+# Dashless forms of names that start with another coin's name, e.g. "bitcoinsv"; they sit
+# one edit away from plurals of that coin ("bitcoins") and are left out of fuzzy matching
+_COMPOUND_ALIASES = {
+    "".join(words) for words in (name.replace('-', ' ').split() for name in list(ALIAS_INDEX) + VALID_CRYPTOS)
+    if len(words) > 1 and ALIAS_INDEX.get(words[0], ALIAS_INDEX.get("".join(words))) != ALIAS_INDEX.get("".join(words))
+}
+_FUZZY_KEYS = [
+    alias for alias in ALIAS_INDEX
+    if ' ' not in alias and len(alias) >= FUZZY_MIN_LENGTH and alias not in _TICKER_SET
+    and alias not in AMBIGUOUS_ALIASES and alias not in _COMPOUND_ALIASES
+]
+
+def _is_written_as_name(words: list) -> bool:
+    if len(words) == 1:
+        return words[0].isupper() and len(words[0]) > 1
+    return all(word[0].isupper() for word in words)
+
+_stats = {"fast_path_hits": 0, "llm_fallbacks": 0}
+_stats_lock = threading.Lock()
+
+def match_coin_names(query: str, has_context: bool = False) -> tuple:
+    """
+    Matches cryptocurrency names in a query against the local alias, ticker and fuzzy index.
+
+    Args:
+        query (str): The user's query, without any prepended context.
+        has_context (bool): Whether previous turns exist that the query could refer to.
+
+    Returns:
+        tuple: A list of matched coin names (in order of appearance) and a confidence between 0 and 1.
+    """
+    if not isinstance(query, str) or not query.strip():
+        return [], 0.0
+
+    words = _WORD_RE.findall(query)
+    lowered = [word.lower() for word in words]
+
+    if has_context and REFERENTIAL_WORDS.intersection(lowered):
+        return [], 0.0
+
+    coins = []
+    confidence = 1.0
+    i = 0
+    while i < len(words):
+        coin, size = None, 1
+        # Longest phrase first so "bitcoin cash" beats "bitcoin"
+        for size in range(min(MAX_ALIAS_WORDS, len(words) - i), 0, -1):
+            alias = " ".join(lowered[i:i + size])
+            coin = ALIAS_INDEX.get(alias)
+            if coin is not None:
+                break
+        if coin is None and lowered[i].endswith("s") and lowered[i][:-1] in ALIAS_INDEX:
+            # Plurals such as "bitcoins"
+            alias, size = lowered[i][:-1], 1
+            coin = ALIAS_INDEX[alias]
+
+        if coin is not None and alias in AMBIGUOUS_ALIASES:
+            if not _is_written_as_name(words[i:i + size]):
+                # Could be ordinary English; let the LLM decide
+                confidence = min(confidence, 0.5)
+                coin, size = None, 1
+        elif coin is not None and alias in LLM_CONFIRMED_ALIASES:
+            confidence = min(confidence, 0.5)
+        elif coin is None and len(lowered[i]) >= FUZZY_MIN_LENGTH and lowered[i] not in FUZZY_STOPWORDS:
+            close = get_close_matches(lowered[i], _FUZZY_KEYS, n=1, cutoff=FUZZY_CUTOFF)
+            if close:
+                coin = ALIAS_INDEX[close[0]]
+                ratio = SequenceMatcher(None, lowered[i], close[0]).ratio()
+                confidence = min(confidence, ratio, FUZZY_MAX_CONFIDENCE)
+
+        if coin is not None and coin not in coins:
+            coins.append(coin)
+        i += size if coin is not None else 1
+
+    if not coins:
+        return [], 0.0
+    return coins, confidence
+
+def fast_path_coin_names(query: str, has_context: bool = False):
+    """
+    Returns the locally matched coin names when the match is confident enough to skip the LLM.
+
+    Args:
+        query (str): The user's query, without any prepended context.
+        has_context (bool): Whether previous turns exist that the query could refer to.
+
+    Returns:
+        list: The matched coin names, or None if the caller should fall back to the LLM.
+    """
+    coins, confidence = match_coin_names(query, has_context)
+    with _stats_lock:
+        if coins and confidence >= FAST_PATH_MIN_CONFIDENCE:
+            _stats["fast_path_hits"] += 1
+            hit = True
+        else:
+            _stats["llm_fallbacks"] += 1
+            hit = False
+    if hit:
+        logger.info(f"Fast-path matched coins {coins} (confidence {confidence:.2f}).")
+        return coins
+    logger.info(f"Fast-path confidence too low ({confidence:.2f}); falling back to LLM.")
+    return None
+
+def get_fast_path_stats() -> dict:
+    """
+    Returns how often the local matcher resolved a query without an LLM call.
+
+    Returns:
+        dict: Fast-path hits, LLM fallbacks and the fast-path hit rate.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats["fast_path_hits"] + stats["llm_fallbacks"]
+    stats["hit_rate"] = stats["fast_path_hits"] / total if total else 0.0
+    return stats
@@ -1,143 +1,590 @@
 
 import os
+import re
 import csv
-import pandas as pd
+import json
 import uuid
 import logging
-from datetime import datetime
-from chromadb import PersistentClient
-from sentence_transformers import SentenceTransformer
+import secrets
+import threading
+from collections import OrderedDict
+from time import monotonic
+import numpy as np
+from chat.embedding_backends import load_embedding_backend
+from chat.embedding_cache import EmbeddingCache, normalize_text
+from chat.session_index import SessionIndex
+from utils.tracing import span
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 # Constants
-CHROMA_DB_DIR_BASE = "./chroma_db"
+CHROMA_DB_DIR = "./chroma_db"
 CSV_DB_DIR_BASE = "./context_db"
+CONTEXT_LOG_DIR_BASE = "./context_log"
 EMBEDDING_MODEL_NAME = "distilbert-base-nli-stsb-mean-tokens"
+EMBEDDING_INFERENCE_BACKEND = "torch"  # "torch", "onnx" or "openvino"
+EMBEDDING_MODEL_FILE = None  # Optional model file to load, e.g. "onnx/model_qint8_avx2.onnx"
+EMBEDDING_BATCH_SIZE = 32  # Texts encoded per forward pass
+EMBEDDING_STORAGE_DTYPE = "float32"  # How the embedding cache stores vectors: "float32", "float16" or "int8"
+LEGACY_EMBEDDING_MODEL_NAME = "distilbert-base-nli-stsb-mean-tokens"  # Model behind collections that don't record theirs
 COLLECTION_NAME = "query_context"
+SESSION_IDLE_TIMEOUT = 30 * 60  # Idle time before a session's context is dropped from memory (in seconds)
+MAX_ACTIVE_SESSIONS = 500  # Maximum number of sessions kept in memory
+MAX_CACHED_ENTRIES = 200_000  # Maximum number of query/response pairs kept in memory across all sessions
+EMBEDDING_CACHE_SIZE = 10_000  # Maximum number of query embeddings kept in memory
+EMBEDDING_CACHE_DIR = None  # Set to a directory (e.g. "./embedding_cache") to persist embeddings across restarts
+EMBEDDING_CACHE_DISK_MAX_ROWS = 1_000_000  # Maximum number of embeddings written to the disk tier
+IN_MEMORY_INDEX_MAX_ENTRIES = 256  # Sessions up to this size are searched in process with hybrid scoring; 0 always uses ChromaDB
 
-# Initialize session-specific paths
-session_id = f"session_{uuid.uuid4().hex[:8]}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-CHROMA_DB_DIR = f"{CHROMA_DB_DIR_BASE}_{session_id}"
-CSV_DB_PATH = f"{CSV_DB_DIR_BASE}_{session_id}.csv"
-
-# Initialize the embedding model
-try:
-    logger.info("Initializing embedding model...")
-    EMBEDDING_MODEL = SentenceTransformer(EMBEDDING_MODEL_NAME)
-    logger.info("Embedding model initialized successfully.")
-except Exception as e:
-    logger.error(f"Error initializing embedding model: {e}")
-    raise
-
-# Initialize ChromaDB client
-try:
-    os.makedirs(CHROMA_DB_DIR, exist_ok=True)
-    logger.info(f"ChromaDB directory ensured at: {CHROMA_DB_DIR}")
-    client = PersistentClient(path=CHROMA_DB_DIR)
-    logger.info("ChromaDB client initialized.")
-except Exception as e:
-    logger.error(f"Error initializing ChromaDB client: {e}")
-    raise
-
-# Initialize ChromaDB collection
-try:
-    logger.info(f"Creating ChromaDB collection: {COLLECTION_NAME}")
-    collection = client.create_collection(name=COLLECTION_NAME)
-    logger.info(f"ChromaDB collection '{COLLECTION_NAME}' initialized.")
-except Exception as e:
-    logger.error(f"Error initializing ChromaDB collection: {e}")
-    raise
-
-def initialize_csv_db() -> None:
-    """
-    Ensures the CSV database exists for the current session.
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]+$")  # Session IDs become part of file names
+RESUMABLE_SESSION_ID_RE = re.compile(r"^session_[A-Za-z0-9_-]{32}$")  # IDs issued by new_session_id()
+
+
+def new_session_id() -> str:
     """
-    try:
-        with open(CSV_DB_PATH, "w", newline="") as f:
+    Returns a new unguessable session ID. Anyone holding it can read the session,
+    so it is safe to put in a URL only because it cannot be guessed.
+    """
+    return f"session_{secrets.token_urlsafe(24)}"
+
+def check_session_id(session_id: str) -> str:
+    """
+    Returns the session ID if it is safe to use in file names.
+
+    Raises:
+        ValueError: If the ID contains anything other than letters, digits, "_" and "-".
+    """
+    if not isinstance(session_id, str) or not SESSION_ID_RE.match(session_id):
+        raise ValueError(f"Invalid session ID: {session_id!r}")
+    return session_id
+
+# Session used by callers that don't pass their own session ID
+session_id = new_session_id()
+
+# Heavy resources, created on first use and shared by every session in the process
+_embedding_model = None
+_chroma_client = None
+_embedding_cache = None
+_init_lock = threading.Lock()
+
+def get_embedding_model():
+    """
+    Returns the process-wide embedding backend, loading it on first use.
+
+    The model and runtime are set by EMBEDDING_MODEL_NAME, EMBEDDING_INFERENCE_BACKEND
+    and EMBEDDING_MODEL_FILE (see `benchmarks/embedding_benchmark.py` to compare them).
+    """
+    global _embedding_model
+    if _embedding_model is None:
+        with _init_lock:
+            if _embedding_model is None:
+                try:
+                    logger.info("Initializing embedding model...")
+                    _embedding_model = load_embedding_backend(
+                        EMBEDDING_MODEL_NAME, EMBEDDING_INFERENCE_BACKEND, EMBEDDING_BATCH_SIZE, EMBEDDING_MODEL_FILE
+                    )
+                    logger.info("Embedding model initialized successfully.")
+                except Exception as e:
+                    logger.error(f"Error initializing embedding model: {e}")
+                    raise
+    return _embedding_model
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Returns the process-wide embedding cache, creating it on first use.
+    """
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _init_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(
+                    EMBEDDING_CACHE_SIZE, EMBEDDING_MODEL_NAME, EMBEDDING_CACHE_DIR, EMBEDDING_STORAGE_DTYPE,
+                    EMBEDDING_CACHE_DISK_MAX_ROWS,
+                )
+    return _embedding_cache
+
+def embed_texts(texts: list) -> list:
+    """
+    Returns embeddings for the given texts, encoding only those missing from the
+    embedding cache, in a single batch.
+
+    Args:
+        texts (list): The texts to embed.
+
+    Returns:
+        list: One embedding (list of floats) per text, in order.
+    """
+    cache = get_embedding_cache()
+    keys = [normalize_text(text) for text in texts]
+    vectors = {}
+    missing = []
+    for key in dict.fromkeys(keys):
+        vector = cache.get(key)
+        if vector is None:
+            missing.append(key)
+        else:
+            vectors[key] = vector
+
+    if missing:
+        with span("embed", texts=len(missing)):
+            encoded = get_embedding_model().encode(missing)
+        new_items = [(key, np.asarray(vector, dtype=np.float32)) for key, vector in zip(missing, encoded)]
+        cache.put_many(new_items)
+        vectors.update(new_items)
+        logger.debug(f"Encoded {len(missing)} of {len(keys)} text(s); the rest came from the embedding cache.")
+
+    return [vectors[key].tolist() for key in keys]
+
+def get_chroma_client():
+    """
+    Returns the process-wide ChromaDB client, creating it on first use.
+    """
+    global _chroma_client
+    if _chroma_client is None:
+        with _init_lock:
+            if _chroma_client is None:
+                try:
+                    from chromadb import PersistentClient
+                    os.makedirs(CHROMA_DB_DIR, exist_ok=True)
+                    logger.info(f"ChromaDB directory ensured at: {CHROMA_DB_DIR}")
+                    _chroma_client = PersistentClient(path=CHROMA_DB_DIR)
+                    logger.info("ChromaDB client initialized.")
+                except Exception as e:
+                    logger.error(f"Error initializing ChromaDB client: {e}")
+                    raise
+    return _chroma_client
+
+def warmup(background: bool = False):
+    """
+    Loads the embedding model and vector store ahead of the first query.
+
+    Args:
+        background (bool): Load on a daemon thread and return immediately.
+
+    Returns:
+        threading.Thread: The loading thread when `background` is True, otherwise None.
+    """
+    def _load() -> None:
+        try:
+            get_embedding_model().encode(["warmup"])
+            get_chroma_client()
+            logger.info("Context manager warmup complete.")
+        except Exception as e:
+            logger.error(f"Error during context manager warmup: {e}", exc_info=True)
+
+    if background:
+        thread = threading.Thread(target=_load, name="context-warmup", daemon=True)
+        thread.start()
+        return thread
+    _load()
+    return None
+
+def _collection_name(session_id: str) -> str:
+    # Chroma names: 3-63 characters from [a-zA-Z0-9._-], starting and ending with an alphanumeric
+    safe = re.sub(r"[^a-zA-Z0-9._-]", "_", session_id)
+    return f"{COLLECTION_NAME}_{safe}"[:63].rstrip("._-")
+
+def _new_entry_id() -> str:
+    return f"query_{uuid.uuid4().hex}"
+
+
+class ContextManager:
+    """
+    Query/response context for one chat session.
+
+    Pairs are held in memory keyed by entry ID, appended to the session's JSONL
+    log and embedded into the session's own collection on the shared Chroma client.
+    Small sessions are searched through an in-process `SessionIndex` instead of ChromaDB.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = check_session_id(session_id)
+        self.csv_path = f"{CSV_DB_DIR_BASE}_{session_id}.csv"
+        self.log_path = f"{CONTEXT_LOG_DIR_BASE}_{session_id}.jsonl"
+        self.entries = {}
+        self.last_used = monotonic()
+        self._collection = None
+        self._index = None
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._load_log()
+
+    def _load_log(self) -> None:
+        """
+        Restores entries from the session's context log, if it already exists.
+
+        A torn last record, left by a crash during a write, is dropped and the log
+        truncated to the last complete record. Other unreadable records are skipped.
+        """
+        if not os.path.exists(self.log_path):
+            return
+        good_end, torn_at = 0, None
+        with open(self.log_path, "rb") as f:
+            for line in f:
+                start, good_end = good_end, good_end + len(line)
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    self.entries[record["id"]] = {"query": record["query"], "response": record["response"]}
+                    torn_at = None
+                except (ValueError, KeyError, TypeError) as e:
+                    torn_at = start
+                    logger.warning(f"Skipping unreadable record in {self.log_path} at byte {start}: {e}")
+        if torn_at is not None:
+            # The bad record was the last one; cut it off so new records start on a clean line
+            os.truncate(self.log_path, torn_at)
+            logger.warning(f"Truncated torn record at the end of {self.log_path}.")
+        logger.info(f"Restored {len(self.entries)} context entries for session {self.session_id}.")
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            with self._lock:
+                if self._collection is None:
+                    self._collection = self._open_collection()
+        return self._collection
+
+    def _open_collection(self):
+        """
+        Opens the session's collection, rebuilding it from the in-memory entries
+        if it was embedded with a different model than EMBEDDING_MODEL_NAME.
+        """
+        client = get_chroma_client()
+        name = _collection_name(self.session_id)
+        metadata = {"embedding_model": EMBEDDING_MODEL_NAME}
+        try:
+            collection = client.get_collection(name=name)
+        except Exception:
+            collection = client.create_collection(name=name, metadata=metadata)
+            logger.info(f"ChromaDB collection '{name}' created.")
+            return collection
+
+        stored_model = (collection.metadata or {}).get("embedding_model", LEGACY_EMBEDDING_MODEL_NAME)
+        if stored_model != EMBEDDING_MODEL_NAME:
+            logger.info(f"Re-embedding {len(self.entries)} entries of '{name}' ({stored_model} -> {EMBEDDING_MODEL_NAME}).")
+            client.delete_collection(name=name)
+            collection = client.create_collection(name=name, metadata=metadata)
+            if self.entries:
+                entry_ids = list(self.entries)
+                queries = [self.entries[entry_id]["query"] for entry_id in entry_ids]
+                collection.add(documents=queries, embeddings=embed_texts(queries), ids=entry_ids)
+        logger.info(f"ChromaDB collection '{name}' initialized.")
+        return collection
+
+    def add_queries(self, pairs: list, embeddings: list = None, entry_ids: list = None) -> list:
+        """
+        Adds many query/response pairs at once, encoding all queries in a single batch
+        and writing them to ChromaDB in a single call.
+
+        Args:
+            pairs (list): A list of (query, response) tuples.
+            embeddings (list): Precomputed query embeddings, one per pair. Encoded if None.
+            entry_ids (list): Entry IDs to use, one per pair. Random IDs are generated if None.
+
+        Returns:
+            list: The entry IDs assigned to the pairs, in order.
+        """
+        if not pairs:
+            return []
+
+        entry_ids = entry_ids or [_new_entry_id() for _ in pairs]
+        queries = [query for query, _ in pairs]
+
+        with self._lock:
+            for entry_id, (query, response) in zip(entry_ids, pairs):
+                self.entries[entry_id] = {"query": query, "response": response}
+
+            # Persist incrementally to the append-only log
+            with open(self.log_path, "a") as f:
+                for entry_id, (query, response) in zip(entry_ids, pairs):
+                    f.write(json.dumps({"id": entry_id, "query": query, "response": response}) + "\n")
+        logger.info(f"{len(pairs)} query/response pair(s) added to context log.")
+
+        # Save to ChromaDB
+        if embeddings is None:
+            embeddings = embed_texts(queries)
+        logger.debug(f"Generated {len(embeddings)} embedding(s).")
+        self.collection.add(
+            documents=queries,
+            embeddings=embeddings,
+            ids=entry_ids
+        )
+        logger.info(f"{len(pairs)} query(s) successfully added to ChromaDB.")
+
+        with self._index_lock:
+            if self._index is not None:
+                self._index.add(entry_ids, embeddings, queries)
+        return entry_ids
+
+    def _get_index(self) -> SessionIndex:
+        """
+        Returns the session's in-process index, building it on first use from the
+        embeddings stored in ChromaDB. Entries missing there are encoded.
+        """
+        with self._index_lock:
+            if self._index is not None:
+                return self._index
+            with self._lock:
+                entry_ids = list(self.entries)
+                queries = [self.entries[entry_id]["query"] for entry_id in entry_ids]
+
+            stored = self.collection.get(ids=entry_ids, include=["embeddings"])
+            vectors = {entry_id: vector for entry_id, vector in zip(stored["ids"], stored["embeddings"]) if vector is not None}
+            missing = [i for i, entry_id in enumerate(entry_ids) if entry_id not in vectors]
+            if missing:
+                for i, vector in zip(missing, embed_texts([queries[i] for i in missing])):
+                    vectors[entry_ids[i]] = vector
+
+            index = SessionIndex()
+            index.add(entry_ids, [vectors[entry_id] for entry_id in entry_ids], queries)
+            self._index = index
+            logger.debug(f"Built in-process index for session {self.session_id} ({len(index)} entries).")
+            return index
+
+    def retrieve(self, query: str, top_k: int = 3) -> list[dict]:
+        """
+        Retrieves the most relevant past queries and responses as context.
+
+        Args:
+            query (str): The new user query.
+            top_k (int): The number of top results to retrieve.
+
+        Returns:
+            list[dict]: A list of dictionaries containing "query" and "response" as keys.
+        """
+        with self._lock:
+            if not self.entries:
+                logger.info("Context is empty; skipping retrieval.")
+                return []
+            use_index = len(self.entries) <= IN_MEMORY_INDEX_MAX_ENTRIES
+
+        # Generate embedding for the input query
+        query_embedding = embed_texts([query])[0]
+        logger.debug("Generated embedding for context retrieval.")
+
+        if use_index:
+            # Rank in process by similarity, recency and coin overlap
+            index = self._get_index()
+            with span("vector_query", top_k=top_k, index="numpy"):
+                hit_ids = index.search(query_embedding, query, top_k)
+        else:
+            # Query ChromaDB for similar embeddings
+            with span("vector_query", top_k=top_k, index="chroma"):
+                results = self.collection.query(query_embeddings=[query_embedding], n_results=top_k)
+            logger.debug(f"ChromaDB query results: {results}")
+            hit_ids = results["ids"][0] if results["ids"] else []
+
+        if not hit_ids:
+            logger.info("No relevant context found.")
+            return []
+
+        # Look up each hit's query/response pair by its entry ID
+        context_entries = []
+        with self._lock:
+            for entry_id in hit_ids:
+                entry = self.entries.get(entry_id)
+                if entry is not None:
+                    context_entries.append(dict(entry))
+        return context_entries
+
+    def trim(self, max_turns: int) -> int:
+        """
+        Keeps only the session's most recent `max_turns` query/response pairs,
+        rewriting its context log and deleting the dropped pairs from ChromaDB.
+
+        Args:
+            max_turns (int): The number of pairs to keep.
+
+        Returns:
+            int: The number of pairs removed.
+        """
+        with self._lock:
+            if len(self.entries) <= max_turns:
+                return 0
+            entry_ids = list(self.entries)
+            removed = entry_ids[:len(entry_ids) - max_turns]
+            for entry_id in removed:
+                del self.entries[entry_id]
+
+            # Rewrite the log next to the old one and swap it in atomically
+            tmp_path = f"{self.log_path}.tmp"
+            with open(tmp_path, "w") as f:
+                for entry_id, entry in self.entries.items():
+                    f.write(json.dumps({"id": entry_id, "query": entry["query"], "response": entry["response"]}) + "\n")
+            os.replace(tmp_path, self.log_path)
+
+        with self._index_lock:
+            # Rebuilt from ChromaDB on next retrieval
+            self._index = None
+        self.collection.delete(ids=removed)
+        logger.info(f"Trimmed session {self.session_id} to its last {max_turns} turns ({len(removed)} removed).")
+        return len(removed)
+
+    def export_csv(self, path: str = None) -> str:
+        """
+        Writes all query/response pairs of the session to a CSV file.
+
+        Args:
+            path (str): Destination of the CSV file. Defaults to the session's CSV path.
+
+        Returns:
+            str: The path the CSV was written to.
+        """
+        path = path or self.csv_path
+        with self._lock:
+            entries = list(self.entries.values())
+        with open(path, "w", newline="") as f:
             writer = csv.writer(f)
             writer.writerow(["query", "response"])
-        logger.info(f"CSV database initialized at: {CSV_DB_PATH}")
+            for entry in entries:
+                writer.writerow([entry["query"], entry["response"]])
+        logger.info(f"Exported {len(entries)} context entries to CSV: {path}")
+        return path
+
+
+# Active sessions, least recently used first
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+def _evict_sessions() -> None:
+    """
+    Drops idle sessions and, beyond the memory caps, the least recently used ones.
+    Evicted sessions keep their log and collection and are restored on next use.
+    """
+    now = monotonic()
+    total_entries = sum(len(manager.entries) for manager in _sessions.values())
+    while len(_sessions) > 1:
+        oldest_id, oldest = next(iter(_sessions.items()))
+        idle = now - oldest.last_used > SESSION_IDLE_TIMEOUT
+        over_cap = len(_sessions) > MAX_ACTIVE_SESSIONS or total_entries > MAX_CACHED_ENTRIES
+        if not (idle or over_cap):
+            break
+        del _sessions[oldest_id]
+        total_entries -= len(oldest.entries)
+        logger.info(f"Evicted context for session {oldest_id} ({'idle' if idle else 'memory cap'}).")
+
+def get_context_manager(session_id: str = None) -> ContextManager:
+    """
+    Returns the context manager for a session, creating or restoring it if needed.
+
+    Args:
+        session_id (str): The caller's session ID. Defaults to this process's session.
+
+    Returns:
+        ContextManager: The session's context manager.
+    """
+    session_id = session_id or globals()["session_id"]
+    with _sessions_lock:
+        manager = _sessions.get(session_id)
+        if manager is None:
+            manager = ContextManager(session_id)
+            _sessions[session_id] = manager
+        manager.last_used = monotonic()
+        _sessions.move_to_end(session_id)
+        _evict_sessions()
+    return manager
+
+def get_loaded_context_manager(session_id: str):
+    """
+    Returns the session's context manager if it is loaded in memory, without
+    marking it as used. Returns None otherwise.
+    """
+    with _sessions_lock:
+        return _sessions.get(session_id)
+
+def is_session_active(session_id: str) -> bool:
+    """
+    Returns True if the session is loaded in memory and was used within SESSION_IDLE_TIMEOUT.
+    """
+    with _sessions_lock:
+        manager = _sessions.get(session_id)
+        return manager is not None and monotonic() - manager.last_used <= SESSION_IDLE_TIMEOUT
+
+def delete_session(session_id: str) -> None:
+    """
+    Deletes a session's context: drops it from memory and removes its context log,
+    CSV export and Chroma collection.
+
+    Args:
+        session_id (str): The ID of the session to delete.
+    """
+    check_session_id(session_id)
+    with _sessions_lock:
+        _sessions.pop(session_id, None)
+    for path in (f"{CONTEXT_LOG_DIR_BASE}_{session_id}.jsonl", f"{CSV_DB_DIR_BASE}_{session_id}.csv"):
+        if os.path.exists(path):
+            os.remove(path)
+    try:
+        get_chroma_client().delete_collection(name=_collection_name(session_id))
     except Exception as e:
-        logger.error(f"Error initializing CSV database: {e}")
-        raise
+        # Usually the session never wrote to ChromaDB
+        logger.debug(f"No ChromaDB collection deleted for session {session_id}: {e}")
+    logger.info(f"Deleted context for session {session_id}.")
 
-def add_query_to_context(query: str, response: str) -> None:
+def export_context_to_csv(path: str = None, session_id: str = None) -> str:
     """
-    Adds a query and its response to both the CSV database and ChromaDB.
+    Writes all query/response pairs of a session to a CSV file.
+
+    Args:
+        path (str): Destination of the CSV file. Defaults to the session's CSV path.
+        session_id (str): The caller's session ID.
+
+    Returns:
+        str: The path the CSV was written to.
+    """
+    return get_context_manager(session_id).export_csv(path)
+
+def add_query_to_context(query: str, response: str, session_id: str = None) -> None:
+    """
+    Adds a query and its response to the session's context store, context log and ChromaDB.
 
     Args:
         query (str): The user query.
         response (str): The response generated by the chatbot.
+        session_id (str): The caller's session ID.
     """
-    try:
-        logger.info(f"Adding query to context: Query: {query}, Response: {response}")
-        
-        # Save to CSV
-        with open(CSV_DB_PATH, "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([query, response])
-        logger.info("Query and response successfully added to CSV.")
+    logger.debug(f"Adding query to context: Query: {query}, Response: {response}")
+    add_queries_to_context([(query, response)], session_id)
 
-        # Save to ChromaDB
-        embedding = EMBEDDING_MODEL.encode([query]).tolist()[0]
-        logger.info("Generated embedding for query.")
-        collection.add(
-            documents=[query],
-            embeddings=[embedding],
-            ids=[f"query_{len(collection.get()['documents']) + 1}"]  # Generate unique ID
-        )
-        logger.info(f"Query successfully added to ChromaDB: {query}")
+def add_queries_to_context(pairs: list, session_id: str = None) -> list:
+    """
+    Adds many query/response pairs at once, encoding all queries in a single batch
+    and writing them to ChromaDB in a single call. Used for imports and replays.
+
+    Args:
+        pairs (list): A list of (query, response) tuples.
+        session_id (str): The caller's session ID.
 
+    Returns:
+        list: The entry IDs assigned to the pairs, in order.
+    """
+    try:
+        return get_context_manager(session_id).add_queries(pairs)
     except Exception as e:
-        logger.error(f"Error adding query to context: {e}")
+        logger.error(f"Error adding queries to context: {e}")
         raise
 
-def retrieve_context_for_query(query: str, top_k: int = 3) -> list[dict]:
+def retrieve_context_for_query(query: str, top_k: int = 3, session_id: str = None) -> list[dict]:
     """
     Retrieves the most relevant past queries and responses as context.
 
     Args:
         query (str): The new user query.
         top_k (int): The number of top results to retrieve.
+        session_id (str): The caller's session ID.
 
     Returns:
         list[dict]: A list of dictionaries containing "query" and "response" as keys.
     """
     try:
-        logger.info(f"Retrieving context for query: {query}")
-        # Generate embedding for the input query
-        query_embedding = EMBEDDING_MODEL.encode([query]).tolist()[0]
-        logger.info("Generated embedding for context retrieval.")
-
-        # Query ChromaDB for similar embeddings
-        results = collection.query(query_embeddings=[query_embedding], n_results=top_k)
-        logger.info(f"ChromaDB query results: {results}")
-
-        if not results["documents"]:
-            logger.info("No relevant context found in ChromaDB.")
-            return []
-
-        # Retrieve corresponding data from the CSV database
-        context_entries = []
-        csv_db = pd.read_csv(CSV_DB_PATH)
-        logger.info(f"CSV database loaded with {len(csv_db)} entries.")
-
-        for retrieved_query in results["documents"][0]:
-            matching_row = csv_db[csv_db["query"] == retrieved_query]
-            if not matching_row.empty:
-                context_entries.append(
-                    {"query": matching_row.iloc[0]["query"], "response": matching_row.iloc[0]["response"]}
-                )
-
-        logger.info(f"Retrieved context entries: {context_entries}")
+        logger.debug(f"Retrieving context for query: {query}")
+        context_entries = get_context_manager(session_id).retrieve(query, top_k)
+        logger.debug(f"Retrieved context entries: {context_entries}")
         return context_entries
 
     except Exception as e:
         logger.error(f"Error retrieving context for query: {query} - {e}")
         return []
-
-# Ensure the session-specific database is initialized
-initialize_csv_db()
@@ -0,0 +1,133 @@
+import logging
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Constants
+INFERENCE_BACKENDS = ("torch", "onnx", "openvino")  # Runtimes supported by sentence-transformers
+STORAGE_DTYPES = ("float32", "float16", "int8")  # Formats embeddings can be stored in
+
+# Extra package each non-default runtime needs on top of sentence-transformers
+BACKEND_REQUIREMENTS = {"onnx": "optimum[onnxruntime]", "openvino": "optimum-intel[openvino]"}
+
+# Vector file suffix per storage format; float32 keeps the original file name
+STORAGE_FILE_SUFFIX = {"float32": "f32", "float16": "f16", "int8": "i8"}
+
+
+class SentenceTransformerBackend:
+    """
+    Embedding backend on top of sentence-transformers, running on CPU.
+
+    Besides the default PyTorch runtime, `inference_backend` can be "onnx" or
+    "openvino", optionally with a pre-exported (e.g. int8-quantized) model file
+    from the model repository, such as "onnx/model_qint8_avx2.onnx".
+    """
+
+    def __init__(self, model_name: str, inference_backend: str = "torch", batch_size: int = 32, model_file: str = None):
+        if inference_backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend {inference_backend!r}; expected one of {INFERENCE_BACKENDS}.")
+        from sentence_transformers import SentenceTransformer
+
+        kwargs = {}
+        if inference_backend != "torch":
+            kwargs["backend"] = inference_backend
+        if model_file:
+            kwargs["model_kwargs"] = {"file_name": model_file}
+        self.model_name = model_name
+        self.inference_backend = inference_backend
+        self.batch_size = batch_size
+        try:
+            self.model = SentenceTransformer(model_name, device="cpu", **kwargs)
+        except ImportError as e:
+            if inference_backend == "torch":
+                raise
+            package = BACKEND_REQUIREMENTS[inference_backend]
+            raise ImportError(
+                f"The {inference_backend!r} inference backend requires {package}: pip install \"{package}\""
+            ) from e
+
+    @property
+    def dim(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: list) -> np.ndarray:
+        """
+        Encodes texts in batches of `batch_size`.
+
+        Returns:
+            np.ndarray: A float32 matrix with one row per text.
+        """
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def load_embedding_backend(model_name: str, inference_backend: str = "torch", batch_size: int = 32,
+                           model_file: str = None) -> SentenceTransformerBackend:
+    """
+    Loads an embedding backend.
+
+    Any object with an `encode(texts) -> np.ndarray` method can stand in for the
+    returned backend, e.g. the hashing encoder used by the benchmarks.
+
+    Args:
+        model_name (str): The sentence-transformers model to load.
+        inference_backend (str): "torch", "onnx" or "openvino".
+        batch_size (int): Texts encoded per forward pass.
+        model_file (str): A specific model file in the repository, e.g. a quantized ONNX export.
+
+    Returns:
+        SentenceTransformerBackend: The loaded backend.
+
+    Raises:
+        ImportError: If the runtime's extra package (see BACKEND_REQUIREMENTS) is not installed.
+    """
+    logger.info(f"Loading embedding model {model_name} ({inference_backend}{f', {model_file}' if model_file else ''})...")
+    return SentenceTransformerBackend(model_name, inference_backend, batch_size, model_file)
+
+def storage_row_dtype(storage_dtype: str, dim: int) -> np.dtype:
+    """
+    Returns the record type of one stored embedding.
+
+    float32 and float16 rows hold the components as is. int8 rows hold the
+    components scaled to [-127, 127] together with their float32 scale.
+    """
+    if storage_dtype == "float32":
+        return np.dtype([("codes", "<f4", (dim,))])
+    if storage_dtype == "float16":
+        return np.dtype([("codes", "<f2", (dim,))])
+    if storage_dtype == "int8":
+        return np.dtype([("scale", "<f4"), ("codes", "i1", (dim,))])
+    raise ValueError(f"Unknown storage dtype {storage_dtype!r}; expected one of {STORAGE_DTYPES}.")
+
+def quantize(vector, storage_dtype: str) -> np.ndarray:
+    """
+    Converts an embedding to its stored record.
+
+    Args:
+        vector: The embedding.
+        storage_dtype (str): "float32", "float16" or "int8".
+
+    Returns:
+        np.ndarray: A 0-d record of `storage_row_dtype(storage_dtype, dim)`.
+    """
+    vector = np.asarray(vector, dtype=np.float32)
+    record = np.zeros((), dtype=storage_row_dtype(storage_dtype, len(vector)))
+    if storage_dtype == "int8":
+        scale = float(np.abs(vector).max()) / 127 or 1.0
+        record["scale"] = scale
+        record["codes"] = np.round(vector / scale).astype(np.int8)
+    else:
+        record["codes"] = vector
+    return record
+
+def dequantize(record) -> np.ndarray:
+    """
+    Converts a stored record back to a float32 embedding.
+    """
+    vector = np.array(record["codes"], dtype=np.float32)
+    if "scale" in record.dtype.names:
+        vector = vector * np.float32(record["scale"])
+    return vector
@@ -0,0 +1,237 @@
+import os
+import re
+import json
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from chat.embedding_backends import STORAGE_FILE_SUFFIX, dequantize, quantize, storage_row_dtype
+
+try:
+    import fcntl
+except ImportError:  # Windows; disk tier writes from several processes are then not serialized
+    fcntl = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes text into a cache key: lowercased with collapsed whitespace.
+    """
+    return _WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of embeddings keyed on normalized text.
+
+    Embeddings are stored as `storage_dtype` ("float32", "float16" or "int8")
+    and returned as float32. With `disk_dir` set, every new embedding is also
+    appended to a vector file that is memory-mapped on startup, so embeddings
+    survive restarts without being loaded into memory up front. Several processes
+    can share the directory; writes are serialized with a file lock. At most
+    `max_disk_rows` vectors are written to disk.
+    """
+
+    def __init__(self, max_size: int, model_name: str, disk_dir: str = None, storage_dtype: str = "float32",
+                 max_disk_rows: int = None):
+        self.max_size = max_size
+        self.model_name = model_name
+        self.storage_dtype = storage_dtype
+        self.disk_dir = disk_dir
+        self.max_disk_rows = max_disk_rows
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._memory = OrderedDict()
+        self._disk_rows = {}
+        self._disk_dim = None
+        self._disk_vectors = None
+        self._index_offset = 0
+        self._disk_full = False
+        self._lock = threading.Lock()
+        if disk_dir:
+            self._open_disk_tier()
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.disk_dir, f"vectors.{STORAGE_FILE_SUFFIX[self.storage_dtype]}")
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.disk_dir, "index.jsonl")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.disk_dir, "meta.json")
+
+    @contextmanager
+    def _locked_disk(self):
+        """
+        Serializes disk tier writes across processes sharing the directory.
+        """
+        with open(os.path.join(self.disk_dir, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_meta(self) -> bool:
+        """
+        Reads the disk tier's metadata, disabling the tier if it was built differently.
+        Returns False if the tier is disabled or has no metadata yet.
+        """
+        if not os.path.exists(self._meta_path):
+            return False
+        with open(self._meta_path) as f:
+            meta = json.load(f)
+        if meta.get("model") != self.model_name:
+            logger.warning(f"Embedding cache at {self.disk_dir} was built for {meta.get('model')}; ignoring it.")
+            self.disk_dir = None
+            return False
+        if meta.get("dtype", "float32") != self.storage_dtype:
+            logger.warning(f"Embedding cache at {self.disk_dir} stores {meta.get('dtype', 'float32')} vectors; ignoring it.")
+            self.disk_dir = None
+            return False
+        self._disk_dim = meta["dim"]
+        return True
+
+    def _read_index_tail(self) -> None:
+        """
+        Loads index records appended since the last read, including other processes' writes.
+        """
+        if not os.path.exists(self._index_path):
+            return
+        with open(self._index_path, "rb") as f:
+            f.seek(self._index_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self._index_offset += len(line)
+                if line.strip():
+                    record = json.loads(line)
+                    self._disk_rows[record["key"]] = record["row"]
+
+    def _open_disk_tier(self) -> None:
+        os.makedirs(self.disk_dir, exist_ok=True)
+        with self._locked_disk():
+            if not self._load_meta():
+                return
+            self._read_index_tail()
+        self._remap()
+        logger.info(f"Embedding cache disk tier opened with {len(self._disk_rows)} vectors.")
+
+    def _remap(self) -> None:
+        row_dtype = storage_row_dtype(self.storage_dtype, self._disk_dim)
+        rows = 0
+        if os.path.exists(self._vectors_path):
+            rows = os.path.getsize(self._vectors_path) // row_dtype.itemsize
+        self._disk_vectors = None
+        if rows:
+            self._disk_vectors = np.memmap(self._vectors_path, dtype=row_dtype, mode="r", shape=(rows,))
+
+    def _append_to_disk(self, items: list) -> None:
+        with self._locked_disk():
+            if not self._load_meta():
+                if self.disk_dir is None:
+                    return
+                self._disk_dim = len(items[0][1]["codes"])
+                with open(self._meta_path, "w") as f:
+                    json.dump({"model": self.model_name, "dim": self._disk_dim, "dtype": self.storage_dtype}, f)
+            self._read_index_tail()
+
+            # Rows are numbered from the file itself, so processes sharing it never reuse a row
+            row_size = storage_row_dtype(self.storage_dtype, self._disk_dim).itemsize
+            size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+            if size % row_size:
+                # Drop a row torn by a killed writer
+                os.truncate(self._vectors_path, size - size % row_size)
+            next_row = size // row_size
+
+            new_rows, seen = [], set(self._disk_rows)
+            for key, record in items:
+                if key in seen:
+                    continue
+                seen.add(key)
+                if self.max_disk_rows is not None and next_row >= self.max_disk_rows:
+                    if not self._disk_full:
+                        logger.warning(f"Embedding cache disk tier is full ({self.max_disk_rows} vectors); not adding more.")
+                        self._disk_full = True
+                    break
+                new_rows.append((key, record, next_row))
+                next_row += 1
+            if not new_rows:
+                return
+
+            # Vectors first, so an index record never points past the end of the file
+            with open(self._vectors_path, "ab") as vectors:
+                for _, record, _ in new_rows:
+                    vectors.write(record.tobytes())
+            with open(self._index_path, "a") as index:
+                for key, _, row in new_rows:
+                    index.write(json.dumps({"key": key, "row": row}) + "\n")
+            self._read_index_tail()
+        self._remap()
+
+    def _remember(self, key: str, record: np.ndarray) -> None:
+        self._memory[key] = record
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get(self, key: str):
+        """
+        Returns the cached embedding for a normalized key, or None on a miss.
+        """
+        with self._lock:
+            record = self._memory.get(key)
+            if record is not None:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                return dequantize(record)
+            row = self._disk_rows.get(key)
+            if row is not None and self._disk_vectors is not None and row < len(self._disk_vectors):
+                record = np.array(self._disk_vectors[row])
+                self._remember(key, record)
+                self.stats["disk_hits"] += 1
+                return dequantize(record)
+            self.stats["misses"] += 1
+            return None
+
+    def put_many(self, items: list) -> None:
+        """
+        Stores (normalized key, embedding) pairs in memory and, if enabled, on disk.
+        """
+        if not items:
+            return
+        records = [(key, quantize(vector, self.storage_dtype)) for key, vector in items]
+        with self._lock:
+            for key, record in records:
+                self._remember(key, record)
+            if self.disk_dir:
+                try:
+                    self._append_to_disk(records)
+                except OSError as e:
+                    logger.error(f"Error writing embedding cache to disk: {e}")
+
+    def get_stats(self) -> dict:
+        """
+        Returns hit, miss and eviction counters along with the hit rate.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self._memory)
+            stats["memory_bytes"] = sum(record.nbytes for record in self._memory.values())
+            stats["disk_size"] = len(self._disk_rows)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -1,8 +1,14 @@
 import os
 import json
+import asyncio
 import re
 import logging
+from time import perf_counter
 from together import Together
+from chat.coin_matcher import VALID_CRYPTOS
+from chat.prompt_builder import format_coin_data, format_market_table, record_prompt
+from utils.tracing import span
+from utils.admission import OVERLOADED_MESSAGE, OverloadedError, upstream_slot
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -13,6 +19,9 @@ logger = logging.getLogger(__name__)
 os.environ["TOGETHER_API_KEY"] = "TOGETHER_API_KEY" # add your together api key
 
 
+# Returned in place of an answer when generation fails
+RESPONSE_ERROR_MESSAGE = "An error occurred while generating the response."
+
 # Initialize the Together client
 try:
     client = Together(api_key=os.environ.get("TOGETHER_API_KEY"))
@@ -21,45 +30,9 @@ except Exception as e:
     logger.error(f"Error initializing Together client: {e}")
     raise
 
-def extract_coin_names(user_query: str) -> list:
-    """
-    Extracts cryptocurrency names from the user's query using LLM, ensuring the response is in JSON format.
-    Parses the JSON and returns a list of valid cryptocurrency names.
-
-    Args:
-        user_query (str): The user's query.
-
-    Returns:
-        list: A list of extracted cryptocurrency names.
-    """
-    if not isinstance(user_query, str) or not user_query.strip():
-        logger.warning("Invalid user query received. Skipping extraction.")
-        return []
-
-    # List of valid cryptocurrency names
-    valid_cryptos = [
-        'bitcoin', 'ethereum', 'tether', 'solana', 'binance-coin', 'dogecoin', 'xrp', 'usd-coin', 'steth',
-        'cardano', 'tron', 'avalanche', 'shiba-inu', 'wrapped-bitcoin', 'chainlink', 'bitcoin-cash', 'polkadot',
-        'near-protocol', 'unus-sed-leo', 'litecoin', 'stellar', 'multi-collateral-dai', 'uniswap', 'sp8de',
-        'internet-computer', 'crypto-com-coin', 'ethereum-classic', 'fetch', 'stacks', 'monero', 'okb', 'filecoin',
-        'aave', 'vechain', 'fantom', 'the-graph', 'injective-protocol', 'thorchain', 'mantra-dao', 'raydium',
-        'algorand', 'theta', 'cosmos', 'bitcoin-sv', 'maker', 'hedera-hashgraph', 'kucoin-token', 'arweave',
-        'lido-dao', 'gala', 'flow', 'helium', 'eos', 'quant', 'polygon', 'gatetoken', 'ecash', 'neo', 'axie-infinity',
-        'pendle', 'aioz-network', 'the-sandbox', 'akash-network', 'tezos', 'nexo', 'mina', 'decentraland',
-        'elrond-egld', 'conflux-network', 'zcash', 'gnosis-gno', 'superfarm', 'chiliz', 'ftx-token', 'nervos-network',
-        'oasis-network', 'iota', 'pancakeswap', 'dexe', 'xinfin-network', 'kava', 'trueusd', 'compound', 'wootrade',
-        'nxm', 'theta-fuel', 'curve-dao-token', 'trust-wallet-token', 'amp', '1inch', 'livepeer', 'iotex',
-        'synthetix-network-token', 'reserve-rights', 'zilliqa', 'holo', 'celo', 'golem-network-tokens', 'dash', 'kusama'
-    ]
-
-    try:
-        # Prepare the LLM prompt
-        messages = [
-            {
-                "role": "user",
-                "content": (
-                    f""" You are an expert in understanding the user input query, and following a set of instructions. You will be given a list of valid
-    cryptocurrency names:{valid_cryptos}. Your task is simple, understand the user input query, and identify the valid cyrptocurrency(s) mentioned
+# Extraction prompt, built once with the full list of valid cryptocurrency names
+EXTRACTION_PROMPT = f""" You are an expert in understanding the user input query, and following a set of instructions. You will be given a list of valid
+    cryptocurrency names:{VALID_CRYPTOS}. Your task is simple, understand the user input query, and identify the valid cyrptocurrency(s) mentioned
      in the user query. You should try to interpret any ambiguous terms present in the user query as something related to the cryptocurrency domain within the realm of rationality.
      ** Important Points: **
      1.You should ALWAYS return the output as a single json only. There should be absolutely nothing else apart from a single json object at all.
@@ -88,25 +61,45 @@ def extract_coin_names(user_query: str) -> list:
     1. Do not make any mistakes. Always double check before returning the output.
 
 """
-                ),
-            },
+
+def extract_coin_names(user_query: str) -> list:
+    """
+    Extracts cryptocurrency names from the user's query using LLM, ensuring the response is in JSON format.
+    Parses the JSON and returns a list of valid cryptocurrency names.
+
+    Args:
+        user_query (str): The user's query.
+
+    Returns:
+        list: A list of extracted cryptocurrency names.
+    """
+    if not isinstance(user_query, str) or not user_query.strip():
+        logger.warning("Invalid user query received. Skipping extraction.")
+        return []
+
+    try:
+        # Prepare the LLM prompt
+        messages = [
+            {"role": "user", "content": EXTRACTION_PROMPT},
             {"role": "user", "content": user_query.strip()},
         ]
+        record_prompt("extraction", messages)
 
         # Call the Together API
-        chat_completion = client.chat.completions.create(
-            model="meta-llama/Meta-Llama-3-8B-Instruct-Lite",
-            messages=messages,
-            temperature=0,
-            max_tokens=200,
-            top_p=1,
-            stream=False,
-            stop=None
-        )
+        with span("llm_extraction"), upstream_slot("together"):
+            chat_completion = client.chat.completions.create(
+                model="meta-llama/Meta-Llama-3-8B-Instruct-Lite",
+                messages=messages,
+                temperature=0,
+                max_tokens=200,
+                top_p=1,
+                stream=False,
+                stop=None
+            )
 
         # Extract the response
         extracted_text = chat_completion.choices[0].message.content
-        logger.info(f"LLM Response: {extracted_text}")
+        logger.debug(f"LLM Response: {extracted_text}")
 
         # Attempt to extract JSON from the response
         json_match = re.search(r"\{.*\}", extracted_text, re.DOTALL)
@@ -118,13 +111,99 @@ def extract_coin_names(user_query: str) -> list:
             return []
 
         # Filter valid cryptocurrencies
-        filtered_currencies = [crypto for crypto in currencies if crypto in valid_cryptos]
+        filtered_currencies = [crypto for crypto in currencies if crypto in VALID_CRYPTOS]
         return filtered_currencies
 
     except Exception as e:
         logger.error(f"Error extracting coin names: {e}", exc_info=True)
         return []
 
+def _build_response_messages(coin_data: dict, user_query: str) -> list:
+    messages = [
+        {"role": "user", "content": "Use the following data to answer the query:"},
+        {"role": "user", "content": f"Coin Data:\n{format_coin_data(coin_data, user_query)}"},
+        {"role": "user", "content": f"Query: {user_query}"},
+    ]
+    record_prompt("response", messages)
+    return messages
+
+def _build_direct_messages(market_snapshot: dict, user_query: str, context_text: str) -> list:
+    messages = [
+        {
+            "role": "user",
+            "content": (
+                "You are a cryptocurrency assistant. Answer the query using only the market data below. "
+                "Each line is: id | symbol | rank | price | 24h change. Work out which coin(s) the query "
+                "refers to, using the previous conversation if the query refers back to it."
+            ),
+        },
+        {"role": "user", "content": f"Market Data:\n{format_market_table(market_snapshot)}"},
+    ]
+    if context_text:
+        messages.append({"role": "user", "content": f"Previous conversation:\n{context_text}"})
+    messages.append({"role": "user", "content": f"Query: {user_query}"})
+    record_prompt("direct", messages)
+    return messages
+
+def _complete(messages: list) -> str:
+    with span("generation", stream=False), upstream_slot("together"):
+        chat_completion = client.chat.completions.create(
+            model="meta-llama/Meta-Llama-3-8B-Instruct-Lite",
+            messages=messages,
+            temperature=0,
+            max_tokens=1024,
+            top_p=1,
+            stream=False,
+            stop=None
+        )
+    return chat_completion.choices[0].message.content
+
+def _complete_stream(messages: list):
+    with span("generation", stream=True) as attrs, upstream_slot("together"):
+        start = perf_counter()
+        stream = client.chat.completions.create(
+            model="meta-llama/Meta-Llama-3-8B-Instruct-Lite",
+            messages=messages,
+            temperature=0,
+            max_tokens=1024,
+            top_p=1,
+            stream=True,
+            stop=None
+        )
+        started = False
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                if not started:
+                    attrs["first_token"] = perf_counter() - start
+                    logger.info("First response token received.")
+                    started = True
+                yield token
+
+def _stream_or_error(messages: list):
+    """
+    Yields the response tokens, or an error message if the call fails before the
+    first token. Returns True only if the whole response was streamed.
+    """
+    started = False
+    try:
+        for token in _complete_stream(messages):
+            started = True
+            yield token
+        logger.info("Final response streamed successfully.")
+        return True
+    except OverloadedError as e:
+        logger.warning(f"LLM overloaded: {e}")
+        if not started:
+            yield OVERLOADED_MESSAGE
+    except Exception as e:
+        logger.error(f"Error streaming final response: {e}", exc_info=True)
+        if not started:
+            yield RESPONSE_ERROR_MESSAGE
+    return False
+
 def generate_final_response(coin_data: dict, user_query: str) -> str:
     """
     Generates the final user response using LLM.
@@ -138,26 +217,126 @@ def generate_final_response(coin_data: dict, user_query: str) -> str:
     """
     try:
         # Prepare messages for LLM
-        messages = [
-            {"role": "user", "content": "Use the following data to answer the query:"},
-            {"role": "user", "content": f"Coin Data: {coin_data}"},
-            {"role": "user", "content": f"Query: {user_query}"},
-        ]
+        messages = _build_response_messages(coin_data, user_query)
 
         # Call the Together API
-        chat_completion = client.chat.completions.create(
-            model="meta-llama/Meta-Llama-3-8B-Instruct-Lite",
-            messages=messages,
-            temperature=0,
-            max_tokens=1024,
-            top_p=1,
-            stream=False,
-            stop=None
-        )
-        response = chat_completion.choices[0].message.content
+        response = _complete(messages)
         logger.info("Final response generated successfully.")
         return response
 
+    except OverloadedError as e:
+        logger.warning(f"LLM overloaded: {e}")
+        return OVERLOADED_MESSAGE
     except Exception as e:
         logger.error(f"Error generating final response: {e}", exc_info=True)
-        return "An error occurred while generating the response."
+        return RESPONSE_ERROR_MESSAGE
+
+def generate_final_response_stream(coin_data: dict, user_query: str):
+    """
+    Generates the final user response using LLM, yielding text chunks as they arrive.
+
+    Args:
+        coin_data (dict): Fetched coin data.
+        user_query (str): The user's original query.
+
+    Yields:
+        str: The next chunk of the response.
+
+    Returns:
+        bool: Whether the response was streamed completely (the generator's return value).
+    """
+    try:
+        messages = _build_response_messages(coin_data, user_query)
+    except Exception as e:
+        logger.error(f"Error streaming final response: {e}", exc_info=True)
+        yield RESPONSE_ERROR_MESSAGE
+        return False
+    return (yield from _stream_or_error(messages))
+
+def generate_direct_response(market_snapshot: dict, user_query: str, context_text: str = "") -> str:
+    """
+    Answers the user's query in a single LLM call from a snapshot of the whole tracked
+    market, without a separate coin extraction step.
+
+    Args:
+        market_snapshot (dict): Coin data for every tracked coin, keyed by coin name.
+        user_query (str): The user's original query.
+        context_text (str): Formatted previous queries and responses.
+
+    Returns:
+        str: The final response generated by LLM.
+    """
+    try:
+        messages = _build_direct_messages(market_snapshot, user_query, context_text)
+        response = _complete(messages)
+        logger.info("Direct response generated successfully.")
+        return response
+
+    except OverloadedError as e:
+        logger.warning(f"LLM overloaded: {e}")
+        return OVERLOADED_MESSAGE
+    except Exception as e:
+        logger.error(f"Error generating direct response: {e}", exc_info=True)
+        return RESPONSE_ERROR_MESSAGE
+
+def generate_direct_response_stream(market_snapshot: dict, user_query: str, context_text: str = ""):
+    """
+    Streaming variant of `generate_direct_response`.
+
+    Args:
+        market_snapshot (dict): Coin data for every tracked coin, keyed by coin name.
+        user_query (str): The user's original query.
+        context_text (str): Formatted previous queries and responses.
+
+    Yields:
+        str: The next chunk of the response.
+
+    Returns:
+        bool: Whether the response was streamed completely (the generator's return value).
+    """
+    try:
+        messages = _build_direct_messages(market_snapshot, user_query, context_text)
+    except Exception as e:
+        logger.error(f"Error streaming direct response: {e}", exc_info=True)
+        yield RESPONSE_ERROR_MESSAGE
+        return False
+    return (yield from _stream_or_error(messages))
+
+async def extract_coin_names_async(user_query: str) -> list:
+    """
+    Async variant of `extract_coin_names`.
+
+    Args:
+        user_query (str): The user's query.
+
+    Returns:
+        list: A list of extracted cryptocurrency names.
+    """
+    return await asyncio.to_thread(extract_coin_names, user_query)
+
+async def generate_final_response_async(coin_data: dict, user_query: str) -> str:
+    """
+    Async variant of `generate_final_response`.
+
+    Args:
+        coin_data (dict): Fetched coin data.
+        user_query (str): The user's original query.
+
+    Returns:
+        str: The final response generated by LLM.
+    """
+    return await asyncio.to_thread(generate_final_response, coin_data, user_query)
+
+async def generate_direct_response_async(market_snapshot: dict, user_query: str, context_text: str = "") -> str:
+    """
+    Async variant of `generate_direct_response`.
+
+    Args:
+        market_snapshot (dict): Coin data for every tracked coin, keyed by coin name.
+        user_query (str): The user's original query.
+        context_text (str): Formatted previous queries and responses.
+
+    Returns:
+        str: The final response generated by LLM.
+    """
+    return await asyncio.to_thread(generate_direct_response, market_snapshot, user_query, context_text)
@@ -0,0 +1,332 @@
+import os
+import asyncio
+import logging
+import threading
+import contextvars
+from time import monotonic
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from api.crypto_api import get_snapshot_version
+from api.market_table import get_market_data
+from chat.context_manager import add_query_to_context, retrieve_context_for_query
+from chat.query_processor import process_user_query_async
+from chat.llm_agent import (
+    generate_final_response_async, generate_final_response_stream, RESPONSE_ERROR_MESSAGE,
+    generate_direct_response_async, generate_direct_response_stream,
+)
+from chat.coin_matcher import VALID_CRYPTOS
+from chat.prompt_builder import format_context
+from chat.response_cache import lookup_response, store_response
+from utils.translation import detect_and_translate_async
+from utils.tracing import span, start_trace
+from utils.admission import OVERLOADED_MESSAGE, OverloadedError, request_limiter
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# "two_call": extract coins, fetch their data, then answer (two LLM calls)
+# "single_call": answer straight from a snapshot of all tracked coins (one LLM call)
+AGENT_MODE = os.environ.get("AGENT_MODE", "two_call")
+
+PIPELINE_WORKERS = 32  # Threads shared by the blocking steps of all in-flight requests
+REQUEST_TIMEOUT = 60  # Longest a request may run before the caller gets an error (in seconds)
+
+# One event loop serves every request; its default executor bounds the worker threads
+_service = {"loop": None, "thread": None}
+_service_lock = threading.Lock()
+
+# Context writes run here so they outlive the event loop of the turn that queued them
+_background_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="context-writer")
+_pending_writes = {}  # session ID -> future of its latest queued write
+_pending_write_lock = threading.Lock()
+
+def _get_service_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the shared pipeline event loop, starting it on a daemon thread on first use.
+    """
+    with _service_lock:
+        if _service["loop"] is None:
+            loop = asyncio.new_event_loop()
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="pipeline"))
+            thread = threading.Thread(target=loop.run_forever, name="pipeline-loop", daemon=True)
+            thread.start()
+            _service["loop"], _service["thread"] = loop, thread
+            logger.info(f"Pipeline event loop started with {PIPELINE_WORKERS} worker threads.")
+        return _service["loop"]
+
+def run_in_service(coro, timeout: float = REQUEST_TIMEOUT):
+    """
+    Runs a coroutine on the shared pipeline event loop and waits for its result.
+    The caller's context variables, such as the current trace, are carried over.
+
+    Args:
+        coro: The coroutine to run.
+        timeout (float): Maximum time to wait (in seconds); the coroutine is cancelled after it.
+
+    Returns:
+        The coroutine's result.
+
+    Raises:
+        concurrent.futures.TimeoutError: If the coroutine did not finish in time.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, _get_service_loop())
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise
+
+def _write_context(query: str, response: str, session_id: str = None) -> None:
+    try:
+        with span("context_write"):
+            add_query_to_context(query, response, session_id=session_id)
+    except Exception as e:
+        logger.error(f"Error writing context in background: {e}", exc_info=True)
+
+def schedule_context_write(query: str, response: str, session_id: str = None) -> None:
+    """
+    Queues a query/response pair to be saved to context off the critical path.
+    Error and overload messages are not answers and are never saved.
+
+    Args:
+        query (str): The translated user query.
+        response (str): The response generated by the chatbot.
+        session_id (str): The caller's session ID.
+    """
+    if not response or response in (RESPONSE_ERROR_MESSAGE, OVERLOADED_MESSAGE):
+        return
+    with _pending_write_lock:
+        # Run in a copy of the caller's context so the write is attached to its trace
+        context = contextvars.copy_context()
+        future = _background_executor.submit(context.run, _write_context, query, response, session_id)
+        _pending_writes[session_id] = future
+        future.add_done_callback(lambda done: _clear_pending_write(session_id, done))
+
+def _clear_pending_write(session_id: str, future) -> None:
+    with _pending_write_lock:
+        if _pending_writes.get(session_id) is future:
+            del _pending_writes[session_id]
+
+def wait_for_context_writes(session_id: str = None, timeout: float = None) -> None:
+    """
+    Blocks until the most recently queued context write for a session has finished.
+
+    Args:
+        session_id (str): The caller's session ID.
+        timeout (float): Maximum time to wait (in seconds). Waits indefinitely if None.
+    """
+    with _pending_write_lock:
+        pending = _pending_writes.get(session_id)
+    if pending is not None:
+        pending.result(timeout=timeout)
+
+async def _translate_and_retrieve(user_input: str, session_id: str = None) -> tuple:
+    """
+    Translates the input and retrieves context for it.
+
+    Context retrieval for the raw input starts alongside translation; it is reused
+    when translation leaves the text unchanged and redone otherwise.
+    """
+    # Earlier turns must be visible to retrieval before this turn reads the context
+    await asyncio.to_thread(wait_for_context_writes, session_id)
+
+    # Step 1 + 2: Translate and speculatively retrieve context at the same time
+    speculative_query = user_input.strip()
+    translated_query, speculative_context = await asyncio.gather(
+        detect_and_translate_async(user_input),
+        asyncio.to_thread(retrieve_context_for_query, speculative_query, session_id=session_id),
+    )
+    logger.debug(f"Translated query: {translated_query}")
+
+    if translated_query == speculative_query:
+        return translated_query, speculative_context
+    context = await asyncio.to_thread(retrieve_context_for_query, translated_query, session_id=session_id)
+    return translated_query, context
+
+async def prepare_query_async(user_input: str, session_id: str = None) -> tuple:
+    """
+    Runs the pipeline steps that come before response generation: translation,
+    context retrieval and fetching the mentioned coins in a single bulk call.
+
+    Args:
+        user_input (str): The user's input message.
+        session_id (str): The caller's session ID.
+
+    Returns:
+        tuple: The translated query, the fetched coin data and its price snapshot version.
+    """
+    translated_query, context = await _translate_and_retrieve(user_input, session_id)
+
+    # Step 3: Extract coins and fetch their data
+    coin_data = await process_user_query_async(translated_query, context)
+    return translated_query, coin_data, get_snapshot_version(list(coin_data))
+
+async def prepare_direct_query_async(user_input: str, session_id: str = None) -> tuple:
+    """
+    Runs the steps that come before a single-call answer: translation, context
+    retrieval and reading the market table (or a live snapshot when it is stale),
+    all at the same time where possible.
+
+    Args:
+        user_input (str): The user's input message.
+        session_id (str): The caller's session ID.
+
+    Returns:
+        tuple: The translated query, the formatted context and the market snapshot.
+    """
+    (translated_query, context), market_snapshot = await asyncio.gather(
+        _translate_and_retrieve(user_input, session_id),
+        asyncio.to_thread(get_market_data, VALID_CRYPTOS),
+    )
+    return translated_query, format_context(context), market_snapshot
+
+def _lookup_cached_response(translated_query: str, coin_data: dict, snapshot_version: tuple):
+    try:
+        return lookup_response(translated_query, list(coin_data), snapshot_version)
+    except Exception as e:
+        logger.error(f"Error reading response cache: {e}", exc_info=True)
+        return None
+
+def _store_cached_response(translated_query: str, coin_data: dict, snapshot_version: tuple, response: str, latency: float) -> None:
+    if not response or response in (RESPONSE_ERROR_MESSAGE, OVERLOADED_MESSAGE):
+        return
+    try:
+        store_response(translated_query, list(coin_data), snapshot_version, response, latency)
+    except Exception as e:
+        logger.error(f"Error writing response cache: {e}", exc_info=True)
+
+async def handle_query_async(user_input: str, session_id: str = None) -> str:
+    """
+    Runs the full chatbot pipeline for one user message in the configured AGENT_MODE.
+    The context write-back is queued in the background once the answer is ready.
+
+    Args:
+        user_input (str): The user's input message.
+        session_id (str): The caller's session ID.
+
+    Returns:
+        str: The bot's response.
+    """
+    with start_trace("query", session_id=session_id):
+        if AGENT_MODE == "single_call":
+            translated_query, context_text, market_snapshot = await prepare_direct_query_async(user_input, session_id)
+            final_response = await generate_direct_response_async(market_snapshot, translated_query, context_text)
+            schedule_context_write(translated_query, final_response, session_id)
+            return final_response
+
+        translated_query, coin_data, snapshot_version = await prepare_query_async(user_input, session_id)
+
+        # Step 4: Reuse a fresh answer to the same question, or generate one using LLM
+        final_response = await asyncio.to_thread(_lookup_cached_response, translated_query, coin_data, snapshot_version)
+        if final_response is None:
+            start = monotonic()
+            final_response = await generate_final_response_async(coin_data, translated_query)
+            _store_cached_response(translated_query, coin_data, snapshot_version, final_response, monotonic() - start)
+
+        # Step 5: Save query and response for context without delaying the answer
+        schedule_context_write(translated_query, final_response, session_id)
+
+        return final_response
+
+def handle_query(user_input: str, session_id: str = None) -> str:
+    """
+    Synchronous entry point for `handle_query_async`, run on the shared pipeline loop.
+
+    At most MAX_CONCURRENT_REQUESTS requests run at once; others wait in a bounded
+    queue, and are shed with OVERLOADED_MESSAGE when it is full or they time out.
+
+    Args:
+        user_input (str): The user's input message.
+        session_id (str): The caller's session ID.
+
+    Returns:
+        str: The bot's response.
+    """
+    try:
+        request_limiter.acquire()
+    except OverloadedError as e:
+        logger.warning(f"Shedding request: {e}")
+        return OVERLOADED_MESSAGE
+    try:
+        return run_in_service(handle_query_async(user_input, session_id))
+    except FutureTimeoutError:
+        logger.error(f"Request timed out after {REQUEST_TIMEOUT} seconds.")
+        return RESPONSE_ERROR_MESSAGE
+    finally:
+        request_limiter.release()
+
+def stream_query(user_input: str, session_id: str = None):
+    """
+    Runs the chatbot pipeline and streams the response as it is generated.
+    The full text is saved to context once the stream is exhausted. Admission
+    works as in `handle_query`, with the slot held until the stream ends, and a
+    timeout while preparing the answer yields RESPONSE_ERROR_MESSAGE.
+
+    Args:
+        user_input (str): The user's input message.
+        session_id (str): The caller's session ID.
+
+    Yields:
+        str: The next chunk of the response.
+    """
+    try:
+        request_limiter.acquire()
+    except OverloadedError as e:
+        logger.warning(f"Shedding request: {e}")
+        yield OVERLOADED_MESSAGE
+        return
+    try:
+        yield from _stream_admitted(user_input, session_id)
+    finally:
+        request_limiter.release()
+
+def _collect(stream, chunks: list):
+    """
+    Re-yields a response stream, appending every chunk to `chunks`, and returns
+    whether the stream completed.
+    """
+    while True:
+        try:
+            chunk = next(stream)
+        except StopIteration as stop:
+            return bool(stop.value)
+        chunks.append(chunk)
+        yield chunk
+
+def _stream_admitted(user_input: str, session_id: str = None):
+    with start_trace("query", session_id=session_id, stream=True):
+        chunks = []
+        if AGENT_MODE == "single_call":
+            try:
+                translated_query, context_text, market_snapshot = run_in_service(prepare_direct_query_async(user_input, session_id))
+            except FutureTimeoutError:
+                logger.error(f"Request timed out after {REQUEST_TIMEOUT} seconds.")
+                yield RESPONSE_ERROR_MESSAGE
+                return
+            stream = generate_direct_response_stream(market_snapshot, translated_query, context_text)
+            if (yield from _collect(stream, chunks)):
+                schedule_context_write(translated_query, "".join(chunks), session_id)
+            return
+
+        try:
+            translated_query, coin_data, snapshot_version = run_in_service(prepare_query_async(user_input, session_id))
+        except FutureTimeoutError:
+            logger.error(f"Request timed out after {REQUEST_TIMEOUT} seconds.")
+            yield RESPONSE_ERROR_MESSAGE
+            return
+
+        # Step 4: Reuse a fresh answer to the same question, or stream one, keeping the full text for context
+        cached_response = _lookup_cached_response(translated_query, coin_data, snapshot_version)
+        if cached_response is not None:
+            chunks.append(cached_response)
+            yield cached_response
+        else:
+            start = monotonic()
+            if not (yield from _collect(generate_final_response_stream(coin_data, translated_query), chunks)):
+                # A failed or truncated answer must not be reused or become context
+                logger.warning("Response stream did not complete; not caching it or saving it to context.")
+                return
+            _store_cached_response(translated_query, coin_data, snapshot_version, "".join(chunks), monotonic() - start)
+
+        # Step 5: Save query and response for context
+        schedule_context_write(translated_query, "".join(chunks), session_id)
@@ -0,0 +1,222 @@
+import math
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Constants
+CONTEXT_TOKEN_BUDGET = 400  # Maximum tokens of retrieved context added to a prompt
+CONTEXT_RESPONSE_MAX_TOKENS = 150  # Longest single previous response kept in the context
+CHARS_PER_TOKEN = 4  # Rough characters-per-token ratio used to estimate prompt size
+
+# Fields sent for every coin
+BASE_FIELDS = ["rank", "priceUsd", "changePercent24Hr"]
+
+# Extra fields, included only when the query mentions one of their keywords
+OPTIONAL_FIELDS = {
+    "marketCapUsd": ["market cap", "marketcap", "cap", "valuation", "worth"],
+    "volumeUsd24Hr": ["volume", "traded", "trading", "liquidity"],
+    "supply": ["supply", "circulating", "how many"],
+    "maxSupply": ["max supply", "maximum supply", "total supply", "how many"],
+    "vwap24Hr": ["vwap", "average price", "weighted"],
+    "explorer": ["explorer", "website", "url"],
+}
+
+FIELD_LABELS = {
+    "rank": "rank",
+    "priceUsd": "price",
+    "changePercent24Hr": "24h change",
+    "marketCapUsd": "market cap",
+    "volumeUsd24Hr": "24h volume",
+    "supply": "supply",
+    "maxSupply": "max supply",
+    "vwap24Hr": "24h VWAP",
+    "explorer": "explorer",
+}
+
+_USD_FIELDS = {"priceUsd", "marketCapUsd", "volumeUsd24Hr", "vwap24Hr"}
+
+_prompt_stats = {}
+_prompt_stats_lock = threading.Lock()
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of tokens in a piece of text.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + "..."
+
+def format_number(value, usd: bool = False) -> str:
+    """
+    Formats a numeric CoinCap value compactly, e.g. "1.23B" or "$0.08123".
+
+    Args:
+        value: The value as returned by CoinCap (usually a numeric string).
+        usd (bool): Prefix the result with a dollar sign.
+
+    Returns:
+        str: The compact representation, or the value unchanged if it is not numeric.
+    """
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+    prefix = "$" if usd else ""
+    magnitude = abs(number)
+    for threshold, suffix in ((1e12, "T"), (1e9, "B"), (1e6, "M")):
+        if magnitude >= threshold:
+            return f"{prefix}{number / threshold:.2f}{suffix}"
+    if magnitude >= 1:
+        return f"{prefix}{number:,.2f}"
+    return f"{prefix}{number:.4g}"
+
+def select_fields(query: str) -> list:
+    """
+    Returns the CoinCap fields relevant to a query.
+
+    Args:
+        query (str): The user's query.
+
+    Returns:
+        list: The base fields followed by any optional fields the query asks about.
+    """
+    lowered = query.lower()
+    fields = list(BASE_FIELDS)
+    for field, keywords in OPTIONAL_FIELDS.items():
+        if any(keyword in lowered for keyword in keywords):
+            fields.append(field)
+    return fields
+
+def format_coin_data(coin_data: dict, query: str) -> str:
+    """
+    Formats coin data as one compact line per coin, keeping only fields relevant to the query.
+
+    Args:
+        coin_data (dict): Fetched coin data keyed by coin name.
+        query (str): The user's query.
+
+    Returns:
+        str: The formatted coin data.
+    """
+    if not coin_data:
+        return "No coin data available."
+
+    fields = select_fields(query)
+    lines = []
+    for coin_name, data in coin_data.items():
+        parts = []
+        for field in fields:
+            value = data.get(field)
+            if value is None:
+                continue
+            if field == "changePercent24Hr":
+                try:
+                    formatted = f"{float(value):+.2f}%"
+                except (TypeError, ValueError):
+                    formatted = str(value)
+            elif field == "rank":
+                formatted = str(value)
+            elif field == "explorer":
+                formatted = value
+            else:
+                formatted = format_number(value, usd=field in _USD_FIELDS)
+            parts.append(f"{FIELD_LABELS[field]} {formatted}")
+        name = data.get("name", coin_name)
+        symbol = data.get("symbol")
+        header = f"{name} ({symbol})" if symbol else name
+        lines.append(f"{header}: {', '.join(parts)}")
+    return "\n".join(lines)
+
+def format_market_table(market_snapshot: dict) -> str:
+    """
+    Formats a snapshot of many coins as a compact table, one "id | symbol | rank | price | 24h change" row per coin.
+
+    Args:
+        market_snapshot (dict): Coin data keyed by coin name.
+
+    Returns:
+        str: The formatted table, ordered by rank.
+    """
+    def _rank(item):
+        try:
+            return int(item[1].get("rank"))
+        except (TypeError, ValueError):
+            return float("inf")
+
+    rows = []
+    for coin_name, data in sorted(market_snapshot.items(), key=_rank):
+        try:
+            change = f"{float(data.get('changePercent24Hr')):+.2f}%"
+        except (TypeError, ValueError):
+            change = "n/a"
+        rows.append(
+            f"{coin_name} | {data.get('symbol', '')} | {data.get('rank', '')} | "
+            f"{format_number(data.get('priceUsd'), usd=True)} | {change}"
+        )
+    return "\n".join(rows)
+
+def format_context(context: list, token_budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    Formats retrieved query/response pairs, most relevant first, within a token budget.
+
+    Args:
+        context (list): The context of previous queries and responses, most relevant first.
+        token_budget (int): Maximum estimated tokens for the formatted context.
+
+    Returns:
+        str: The formatted context, one pair per line.
+    """
+    lines = []
+    used = 0
+    for elem in context:
+        response = _truncate_to_tokens(str(elem["response"]), CONTEXT_RESPONSE_MAX_TOKENS)
+        line = f"Query: {elem['query']} Response: {response}"
+        remaining = token_budget - used
+        if remaining <= 0:
+            break
+        if estimate_tokens(line) > remaining:
+            line = _truncate_to_tokens(line, remaining)
+        lines.append(line)
+        used += estimate_tokens(line)
+    return "\n".join(lines)
+
+def record_prompt(kind: str, messages: list) -> int:
+    """
+    Estimates the prompt size of an LLM call, logs it and adds it to the per-kind totals.
+
+    Args:
+        kind (str): The kind of call, e.g. "extraction" or "response".
+        messages (list): The chat messages sent to the LLM.
+
+    Returns:
+        int: The estimated prompt tokens.
+    """
+    tokens = sum(estimate_tokens(message["content"]) for message in messages)
+    with _prompt_stats_lock:
+        stats = _prompt_stats.setdefault(kind, {"calls": 0, "prompt_tokens": 0, "max_prompt_tokens": 0})
+        stats["calls"] += 1
+        stats["prompt_tokens"] += tokens
+        stats["max_prompt_tokens"] = max(stats["max_prompt_tokens"], tokens)
+    logger.info(f"Prompt tokens ({kind}): ~{tokens}")
+    return tokens
+
+def get_prompt_stats() -> dict:
+    """
+    Returns estimated prompt token totals per kind of LLM call.
+
+    Returns:
+        dict: A mapping of call kind to its call count, total, average and maximum prompt tokens.
+    """
+    with _prompt_stats_lock:
+        snapshot = {kind: dict(stats) for kind, stats in _prompt_stats.items()}
+    for stats in snapshot.values():
+        stats["avg_prompt_tokens"] = stats["prompt_tokens"] / stats["calls"] if stats["calls"] else 0.0
+    return snapshot
@@ -1,13 +1,37 @@
-
-
 import logging
-from api.crypto_api import fetch_coin_data
-from chat.llm_agent import extract_coin_names
+from api.market_table import get_coins_data, get_coins_data_async
+from chat.llm_agent import extract_coin_names, extract_coin_names_async
+from chat.coin_matcher import fast_path_coin_names
+from chat.prompt_builder import format_context
+from utils.tracing import span
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+def build_combined_query(user_query: str, context: list) -> str:
+    """
+    Combines the user's query with the previous queries and responses, trimmed to the context token budget.
+
+    Args:
+        user_query (str): The user's query.
+        context (list): The context of previous queries and responses.
+
+    Returns:
+        str: The query prefixed with the context.
+    """
+    prev_info = format_context(context)
+
+    # Combine the query with context
+    return f"This is the context: {prev_info}\nQuery: {user_query}"
+
+def _log_fetched_coins(coin_names: list, coin_data: dict) -> None:
+    for coin_name in coin_names:
+        if coin_name in coin_data:
+            logger.debug(f"Fetched data for coin: {coin_name}")
+        else:
+            logger.warning(f"No data found for coin: {coin_name}")
+
 def process_user_query(user_query: str, context: list) -> dict:
     """
     Process the user's query to extract coin names, fetch data for those coins,
@@ -21,30 +45,48 @@ def process_user_query(user_query: str, context: list) -> dict:
         dict: A dictionary of coin data for each coin mentioned in the query.
     """
     try:
-        logger.info(f"Processing query: {user_query}")
-
-        # Build context information
-        prev_info = ""
-        for elem in context:
-            pair = f"Query: {elem['query']} Response: {elem['response']}\n"
-            prev_info += pair
-
-        # Combine the query with context
-        combined_query = f"This is the context: {prev_info}\nQuery: {user_query}"
-        
-        # Extract coin names considering context
-        coin_names = extract_coin_names(combined_query)
+        logger.debug(f"Processing query: {user_query}")
+
+        # Resolve coin names locally, falling back to the LLM with context when unsure
+        with span("coin_extraction", method="fast_path") as attrs:
+            coin_names = fast_path_coin_names(user_query, has_context=bool(context))
+            if coin_names is None:
+                attrs["method"] = "llm"
+                coin_names = extract_coin_names(build_combined_query(user_query, context))
+        logger.info(f"Extracted coin names: {coin_names}")
+
+        # Read the coins from the market table, fetching any it can't serve in one bulk request
+        coin_data = get_coins_data(coin_names) if coin_names else {}
+        _log_fetched_coins(coin_names, coin_data)
+
+        return coin_data
+    except Exception as e:
+        logger.error(f"Error processing user query: {e}", exc_info=True)
+        return {}
+
+async def process_user_query_async(user_query: str, context: list) -> dict:
+    """
+    Async variant of `process_user_query`.
+
+    Args:
+        user_query (str): The user's query.
+        context (list): The context of previous queries and responses.
+
+    Returns:
+        dict: A dictionary of coin data for each coin mentioned in the query.
+    """
+    try:
+        logger.debug(f"Processing query: {user_query}")
+
+        with span("coin_extraction", method="fast_path") as attrs:
+            coin_names = fast_path_coin_names(user_query, has_context=bool(context))
+            if coin_names is None:
+                attrs["method"] = "llm"
+                coin_names = await extract_coin_names_async(build_combined_query(user_query, context))
         logger.info(f"Extracted coin names: {coin_names}")
 
-        # Fetch data for each coin
-        coin_data = {}
-        for coin_name in coin_names:
-            data = fetch_coin_data(coin_name)
-            if data:
-                coin_data[coin_name] = data
-                logger.info(f"Fetched data for coin: {coin_name}")
-            else:
-                logger.warning(f"No data found for coin: {coin_name}")
+        coin_data = await get_coins_data_async(coin_names) if coin_names else {}
+        _log_fetched_coins(coin_names, coin_data)
 
         return coin_data
     except Exception as e:
@@ -0,0 +1,132 @@
+import logging
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+import numpy as np
+
+from api.crypto_api import PRICE_CACHE_TTL
+from chat.context_manager import embed_texts
+from chat.prompt_builder import select_fields
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Constants
+RESPONSE_CACHE_SIMILARITY = 0.95  # Minimum cosine similarity between queries to reuse an answer
+RESPONSE_CACHE_TTL = PRICE_CACHE_TTL  # Answers are only reused while the price data behind them is this fresh (in seconds)
+RESPONSE_CACHE_STALE_TTL = 0  # Maximum age of an answer served from an older price snapshot (in seconds); 0 disables
+RESPONSE_CACHE_MAX_COIN_SETS = 1024  # Maximum number of distinct coin sets cached
+RESPONSE_CACHE_ENTRIES_PER_SET = 32  # Maximum number of answers cached per coin set
+
+# (coin set, selected fields) -> list of entries, keys kept in LRU order
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+_response_cache_stats = {"hits": 0, "misses": 0, "stale_serves": 0, "stores": 0, "latency_saved": 0.0}
+
+def _cache_key(query: str, coin_names: list) -> tuple:
+    # Answers are only comparable when built from the same coins and the same data fields
+    return frozenset(coin_names), tuple(select_fields(query))
+
+def _unit_vector(query: str) -> np.ndarray:
+    vector = np.asarray(embed_texts([query])[0], dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def lookup_response(query: str, coin_names: list, snapshot_version: tuple):
+    """
+    Returns a cached answer for a semantically equivalent question about the same coins
+    and the same data fields (see `select_fields`).
+
+    An entry matches when its query embedding is within RESPONSE_CACHE_SIMILARITY,
+    it is younger than RESPONSE_CACHE_TTL and it was generated from the same price
+    snapshot. Entries from an older snapshot are served only within RESPONSE_CACHE_STALE_TTL.
+
+    Args:
+        query (str): The translated user query.
+        coin_names (list): The coins whose data the answer is based on.
+        snapshot_version (tuple): The current price snapshot version of those coins.
+
+    Returns:
+        str: The cached answer, or None on a miss.
+    """
+    key = _cache_key(query, coin_names)
+    with _response_cache_lock:
+        if key not in _response_cache:
+            _response_cache_stats["misses"] += 1
+            return None
+
+    query_vector = _unit_vector(query)
+    now = monotonic()
+    with _response_cache_lock:
+        entries = _response_cache.get(key, [])
+        # Drop entries that can no longer be served
+        entries[:] = [
+            entry for entry in entries
+            if now - entry["created_at"] <= max(RESPONSE_CACHE_TTL, RESPONSE_CACHE_STALE_TTL)
+        ]
+        best, best_score, stale = None, RESPONSE_CACHE_SIMILARITY, False
+        for entry in entries:
+            age = now - entry["created_at"]
+            entry_stale = entry["snapshot_version"] != snapshot_version
+            if (entry_stale and age > RESPONSE_CACHE_STALE_TTL) or (not entry_stale and age > RESPONSE_CACHE_TTL):
+                continue
+            score = float(np.dot(entry["vector"], query_vector))
+            # Prefer answers from the current snapshot over stale ones
+            if score >= best_score and (best is None or stale or not entry_stale):
+                best, best_score, stale = entry, score, entry_stale
+
+        if best is None:
+            _response_cache_stats["misses"] += 1
+            return None
+
+        _response_cache.move_to_end(key)
+        _response_cache_stats["hits"] += 1
+        _response_cache_stats["latency_saved"] += best["latency"]
+        if stale:
+            _response_cache_stats["stale_serves"] += 1
+
+    logger.info(f"Response cache hit (similarity {best_score:.3f}{', stale' if stale else ''}).")
+    return best["response"]
+
+def store_response(query: str, coin_names: list, snapshot_version: tuple, response: str, latency: float) -> None:
+    """
+    Caches an answer for reuse by semantically equivalent questions.
+
+    Args:
+        query (str): The translated user query.
+        coin_names (list): The coins whose data the answer is based on.
+        snapshot_version (tuple): The price snapshot version the answer was generated from.
+        response (str): The generated answer.
+        latency (float): How long generating the answer took (in seconds).
+    """
+    entry = {
+        "vector": _unit_vector(query),
+        "snapshot_version": snapshot_version,
+        "response": response,
+        "latency": latency,
+        "created_at": monotonic(),
+    }
+    key = _cache_key(query, coin_names)
+    with _response_cache_lock:
+        entries = _response_cache.setdefault(key, [])
+        entries.append(entry)
+        del entries[:-RESPONSE_CACHE_ENTRIES_PER_SET]
+        _response_cache.move_to_end(key)
+        while len(_response_cache) > RESPONSE_CACHE_MAX_COIN_SETS:
+            _response_cache.popitem(last=False)
+        _response_cache_stats["stores"] += 1
+
+def get_response_cache_stats() -> dict:
+    """
+    Returns response cache counters.
+
+    Returns:
+        dict: Hits, misses, stale serves, stores, total generation latency saved and hit rate.
+    """
+    with _response_cache_lock:
+        stats = dict(_response_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
@@ -0,0 +1,247 @@
+import os
+import glob
+import shutil
+import sqlite3
+import logging
+import threading
+from time import time
+from chat import context_manager
+from chat.context_manager import ContextManager, delete_session, get_loaded_context_manager, is_session_active
+from chat.session_history import import_legacy_sessions
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Constants
+RETENTION_MAX_AGE = 30 * 24 * 3600  # Sessions idle for longer are deleted (in seconds)
+RETENTION_MAX_SESSIONS = 1000  # Beyond this, the least recently active sessions are deleted
+RETENTION_MAX_BYTES = 1024 ** 3  # Beyond this total size of sessions (logs, CSVs and Chroma collections), the oldest are deleted
+RETENTION_MAX_TURNS = 200  # Sessions with more turns are trimmed to their most recent ones
+LEGACY_STORE_DIR = "."  # Where the old per-session `chroma_db_<id>` directories and CSVs were written
+COMPACTION_INTERVAL = 6 * 3600  # Time between two runs of the background compaction job (in seconds)
+
+_compaction_job = {"thread": None, "stop": None}
+_compaction_lock = threading.Lock()
+
+
+def get_dir_size(path: str) -> int:
+    """
+    Returns the total size of the files under a directory, or of a single file (in bytes).
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _storage_size(legacy_dir: str) -> int:
+    paths = [context_manager.CHROMA_DB_DIR]
+    paths += glob.glob(f"{context_manager.CONTEXT_LOG_DIR_BASE}_*.jsonl")
+    paths += glob.glob(f"{context_manager.CSV_DB_DIR_BASE}_*.csv")
+    paths += glob.glob(os.path.join(legacy_dir, "chroma_db_session_*"))
+    return sum(get_dir_size(path) for path in dict.fromkeys(paths) if os.path.exists(path))
+
+def _collection_sizes() -> dict:
+    """
+    Returns the on-disk size of each Chroma collection's vector index (in bytes), keyed by collection name.
+
+    Chroma keeps every collection's HNSW index in a directory named after its vector
+    segment, which is looked up in Chroma's SQLite catalog. Embedding rows in the
+    shared SQLite file are not attributed to collections.
+    """
+    db_path = os.path.join(context_manager.CHROMA_DB_DIR, "chroma.sqlite3")
+    if not os.path.exists(db_path):
+        return {}
+    try:
+        with sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) as connection:
+            rows = connection.execute(
+                "SELECT c.name, s.id FROM segments s JOIN collections c ON s.collection = c.id WHERE s.scope = 'VECTOR'"
+            ).fetchall()
+    except sqlite3.Error as e:
+        logger.warning(f"Could not read Chroma collection sizes; only counting logs and CSVs: {e}")
+        return {}
+    sizes = {}
+    for name, segment_id in rows:
+        segment_dir = os.path.join(context_manager.CHROMA_DB_DIR, segment_id)
+        sizes[name] = sizes.get(name, 0) + (get_dir_size(segment_dir) if os.path.isdir(segment_dir) else 0)
+    return sizes
+
+def list_stored_sessions() -> list:
+    """
+    Returns the sessions saved by the context store, most recently active first.
+
+    Returns:
+        list: One dict per session with its ID, last activity (Unix time) and size
+        on disk of its context log, CSV export and Chroma collection (in bytes).
+    """
+    prefix = f"{context_manager.CONTEXT_LOG_DIR_BASE}_"
+    collection_sizes = _collection_sizes()
+    sessions = []
+    for log_path in glob.glob(f"{prefix}*.jsonl"):
+        session_id = log_path[len(prefix):-len(".jsonl")]
+        csv_path = f"{context_manager.CSV_DB_DIR_BASE}_{session_id}.csv"
+        size = os.path.getsize(log_path) + (os.path.getsize(csv_path) if os.path.exists(csv_path) else 0)
+        size += collection_sizes.get(context_manager._collection_name(session_id), 0)
+        sessions.append({"session_id": session_id, "last_active": os.path.getmtime(log_path), "bytes": size})
+    return sorted(sessions, key=lambda session: session["last_active"], reverse=True)
+
+def _legacy_session_ids(legacy_dir: str) -> list:
+    # Old stores have a Chroma directory and no context log in the current layout
+    prefix = os.path.join(legacy_dir, "chroma_db_")
+    session_ids = []
+    for path in glob.glob(f"{prefix}session_*"):
+        session_id = path[len(prefix):]
+        csv_path = os.path.join(legacy_dir, f"context_db_{session_id}.csv")
+        log_path = f"{context_manager.CONTEXT_LOG_DIR_BASE}_{session_id}.jsonl"
+        if os.path.isdir(path) and os.path.exists(csv_path) and not os.path.exists(log_path):
+            session_ids.append(session_id)
+    return sorted(session_ids)
+
+def compact_context_store(max_age: float = RETENTION_MAX_AGE, max_sessions: int = RETENTION_MAX_SESSIONS,
+                          max_bytes: int = RETENTION_MAX_BYTES, max_turns: int = RETENTION_MAX_TURNS,
+                          legacy_dir: str = LEGACY_STORE_DIR, dry_run: bool = False) -> dict:
+    """
+    Applies the retention policy to the context store and reports the space reclaimed.
+
+    1. Old per-session stores (a `chroma_db_<id>` directory and CSV) idle for longer
+       than `max_age` are removed. The others are imported into new sessions in the
+       shared store, reusing their embeddings, then removed.
+    2. Sessions idle for longer than `max_age` are deleted, then the least recently
+       active ones until at most `max_sessions` remain and they fit in `max_bytes`.
+    3. Remaining sessions with more than `max_turns` turns are trimmed to their most recent ones.
+
+    Sessions in use (loaded and active within the idle timeout) are never deleted.
+    Compaction itself never loads sessions into the active session map.
+
+    Args:
+        max_age (float): Maximum session idle time (in seconds).
+        max_sessions (int): Maximum number of stored sessions.
+        max_bytes (int): Maximum total size of sessions: logs, CSV exports and Chroma collections (in bytes).
+        max_turns (int): Maximum number of turns kept per session.
+        legacy_dir (str): Directory searched for old per-session stores.
+        dry_run (bool): Only report what would be done.
+
+    Returns:
+        dict: Merged, deleted and trimmed session counts, removed turns, and storage
+        size before and after along with the bytes reclaimed.
+    """
+    report = {
+        "merged_legacy_sessions": 0, "deleted_sessions": [], "trimmed_sessions": 0, "removed_turns": 0,
+        "bytes_before": _storage_size(legacy_dir), "dry_run": dry_run,
+    }
+
+    # Step 1: Drop expired old per-session stores and fold the others into the shared store
+    now = time()
+    legacy_ids, expired_legacy_ids, last_active = [], [], {}
+    for session_id in _legacy_session_ids(legacy_dir):
+        last_active[session_id] = os.path.getmtime(os.path.join(legacy_dir, f"context_db_{session_id}.csv"))
+        (expired_legacy_ids if now - last_active[session_id] > max_age else legacy_ids).append(session_id)
+    report["deleted_sessions"].extend(expired_legacy_ids)
+
+    if not dry_run:
+        imported = {}
+        if legacy_ids:
+            imported = import_legacy_sessions(legacy_dir, session_ids=legacy_ids)["session_ids"]
+        for session_id in legacy_ids:
+            # Carry the old store's last activity over so age-based retention still applies
+            log_path = f"{context_manager.CONTEXT_LOG_DIR_BASE}_{imported[session_id]}.jsonl"
+            if os.path.exists(log_path):
+                os.utime(log_path, (last_active[session_id], last_active[session_id]))
+        for session_id in legacy_ids + expired_legacy_ids:
+            shutil.rmtree(os.path.join(legacy_dir, f"chroma_db_{session_id}"), ignore_errors=True)
+            os.remove(os.path.join(legacy_dir, f"context_db_{session_id}.csv"))
+    report["merged_legacy_sessions"] = len(legacy_ids)
+
+    # Step 2: Delete expired sessions, then the oldest ones beyond the caps
+    kept, total_bytes = [], 0
+    for session in list_stored_sessions():
+        if is_session_active(session["session_id"]):
+            kept.append(session)
+            total_bytes += session["bytes"]
+            continue
+        expired = now - session["last_active"] > max_age
+        over_cap = len(kept) >= max_sessions or total_bytes + session["bytes"] > max_bytes
+        if expired or over_cap:
+            if not dry_run:
+                try:
+                    delete_session(session["session_id"])
+                except ValueError as e:
+                    logger.warning(f"Skipping unexpected context log {session['session_id']!r}: {e}")
+                    continue
+            report["deleted_sessions"].append(session["session_id"])
+        else:
+            kept.append(session)
+            total_bytes += session["bytes"]
+
+    # Step 3: Trim oversized sessions
+    for session in kept:
+        log_path = f"{context_manager.CONTEXT_LOG_DIR_BASE}_{session['session_id']}.jsonl"
+        with open(log_path) as f:
+            turns = sum(1 for line in f if line.strip())
+        if turns <= max_turns:
+            continue
+        # A loaded session is trimmed in place; others through a throwaway manager, so
+        # compaction neither marks them active nor evicts sessions users are in
+        try:
+            manager = get_loaded_context_manager(session["session_id"]) or ContextManager(session["session_id"])
+        except ValueError as e:
+            logger.warning(f"Skipping unexpected context log {session['session_id']!r}: {e}")
+            continue
+        excess = len(manager.entries) - max_turns
+        if excess > 0:
+            report["trimmed_sessions"] += 1
+            if dry_run:
+                report["removed_turns"] += excess
+                continue
+            report["removed_turns"] += manager.trim(max_turns)
+            # Trimming is not activity; keep the session's age
+            os.utime(log_path, (session["last_active"], session["last_active"]))
+
+    report["bytes_after"] = _storage_size(legacy_dir)
+    report["reclaimed_bytes"] = report["bytes_before"] - report["bytes_after"]
+    logger.info(
+        f"Context store compaction{' (dry run)' if dry_run else ''}: merged {report['merged_legacy_sessions']} "
+        f"legacy, deleted {len(report['deleted_sessions'])}, trimmed {report['trimmed_sessions']} session(s) "
+        f"({report['removed_turns']} turns); reclaimed {report['reclaimed_bytes'] / 1024 ** 2:.1f} MB."
+    )
+    return report
+
+def _compaction_loop(interval: float, stop: threading.Event) -> None:
+    while not stop.wait(interval):
+        try:
+            compact_context_store()
+        except Exception as e:
+            logger.error(f"Error compacting context store: {e}", exc_info=True)
+
+def start_compaction_job(interval: float = COMPACTION_INTERVAL) -> None:
+    """
+    Runs `compact_context_store` with the default policy every `interval` seconds
+    on a daemon thread. Does nothing if the job is already running.
+
+    Args:
+        interval (float): Time between two runs (in seconds).
+    """
+    with _compaction_lock:
+        if _compaction_job["thread"] is not None and _compaction_job["thread"].is_alive():
+            return
+        stop = threading.Event()
+        thread = threading.Thread(target=_compaction_loop, args=(interval, stop), name="context-compaction", daemon=True)
+        _compaction_job["thread"], _compaction_job["stop"] = thread, stop
+        thread.start()
+    logger.info(f"Context store compaction scheduled every {interval}s.")
+
+def stop_compaction_job() -> None:
+    """
+    Stops the background compaction job.
+    """
+    with _compaction_lock:
+        stop = _compaction_job["stop"]
+        _compaction_job["thread"], _compaction_job["stop"] = None, None
+    if stop is not None:
+        stop.set()
@@ -0,0 +1,214 @@
+import os
+import re
+import csv
+import glob
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from chat import context_manager
+from chat.context_manager import (
+    COLLECTION_NAME, EMBEDDING_MODEL_NAME, LEGACY_EMBEDDING_MODEL_NAME, RESUMABLE_SESSION_ID_RE, ContextManager,
+    embed_texts, get_context_manager, get_embedding_cache, get_loaded_context_manager, new_session_id,
+)
+from chat.embedding_cache import normalize_text
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Constants
+LEGACY_HISTORY_DIR = "./prev_chats"  # Sessions saved by the previous per-session Chroma layout
+ENCODE_BATCH_SIZE = 64  # Queries encoded per batch when an imported row has no stored embedding
+ENCODE_WORKERS = 4  # Batches encoded in parallel
+
+_LEGACY_CSV_RE = re.compile(r"^context_db_(?P<session_id>.+)\.csv$")
+
+
+def list_legacy_sessions(source_dir: str = LEGACY_HISTORY_DIR) -> list:
+    """
+    Returns the IDs of the sessions saved in the legacy layout, i.e. a
+    `context_db_<session_id>.csv` file with an optional `chroma_db_<session_id>` directory.
+
+    Args:
+        source_dir (str): Directory holding the legacy session files.
+
+    Returns:
+        list: The session IDs, sorted.
+    """
+    session_ids = []
+    for path in glob.glob(os.path.join(source_dir, "context_db_*.csv")):
+        match = _LEGACY_CSV_RE.match(os.path.basename(path))
+        if match:
+            session_ids.append(match.group("session_id"))
+    return sorted(session_ids)
+
+def _read_legacy_rows(source_dir: str, session_id: str) -> list:
+    with open(os.path.join(source_dir, f"context_db_{session_id}.csv"), newline="") as f:
+        return [(row["query"] or "", row["response"] or "") for row in csv.DictReader(f)]
+
+def _read_legacy_embeddings(source_dir: str, session_id: str) -> dict:
+    """
+    Returns the embeddings stored in a legacy session's Chroma directory, keyed by row index.
+
+    Legacy entries were added with IDs "query_1", "query_2", ... in CSV row order.
+    They are only usable while the configured model is the one that produced them.
+    """
+    chroma_dir = os.path.join(source_dir, f"chroma_db_{session_id}")
+    if not os.path.isdir(chroma_dir) or EMBEDDING_MODEL_NAME != LEGACY_EMBEDDING_MODEL_NAME:
+        return {}
+    try:
+        from chromadb import PersistentClient
+        collection = PersistentClient(path=chroma_dir).get_collection(name=COLLECTION_NAME)
+        stored = collection.get(include=["documents", "embeddings"])
+    except Exception as e:
+        logger.warning(f"Could not read stored embeddings for {session_id}: {e}")
+        return {}
+
+    embeddings = {}
+    for entry_id, document, embedding in zip(stored["ids"], stored["documents"], stored["embeddings"]):
+        match = re.fullmatch(r"query_(\d+)", entry_id)
+        if match and embedding is not None:
+            embeddings[int(match.group(1)) - 1] = (document, np.asarray(embedding, dtype=np.float32))
+    return embeddings
+
+def _encode_missing(queries: list, max_workers: int) -> list:
+    """
+    Encodes queries in parallel batches of ENCODE_BATCH_SIZE.
+    """
+    batches = [queries[i:i + ENCODE_BATCH_SIZE] for i in range(0, len(queries), ENCODE_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="history-encoder") as executor:
+        return [vector for batch in executor.map(embed_texts, batches) for vector in batch]
+
+def import_legacy_sessions(source_dir: str = LEGACY_HISTORY_DIR, target_session_id: str = None,
+                           session_ids: list = None, max_workers: int = ENCODE_WORKERS) -> dict:
+    """
+    Imports sessions saved in the legacy layout into the context store, reusing
+    their stored embeddings. Only rows without a usable embedding are encoded,
+    in parallel batches across all imported sessions.
+
+    Imported entries get deterministic IDs, so importing into the same target
+    again skips rows that are already present. Targets are written through their
+    loaded context manager if there is one, and otherwise through a throwaway one,
+    so an import never marks sessions as active.
+
+    Args:
+        source_dir (str): Directory holding the legacy session files.
+        target_session_id (str): Merge every imported session into this session.
+            If None, each session is imported into a new session from `new_session_id()`,
+            since legacy IDs cannot be resumed.
+        session_ids (list): The legacy sessions to import. Defaults to all of them.
+        max_workers (int): Number of batches encoded in parallel.
+
+    Returns:
+        dict: Counts of imported sessions, imported rows, reused embeddings,
+        newly encoded rows and rows skipped as already imported, and under
+        "session_ids" the session each legacy ID was imported into.
+    """
+    session_ids = session_ids if session_ids is not None else list_legacy_sessions(source_dir)
+    stats = {"sessions": 0, "rows": 0, "reused_embeddings": 0, "encoded": 0, "skipped": 0, "session_ids": {}}
+
+    # Collect every row that still needs importing, with its stored embedding if any
+    plans = []  # (manager, pairs, embeddings, entry IDs)
+    missing = []  # (plan index, row position) of rows to encode
+    managers = {}  # target session ID -> its context manager, one per target
+    for session_id in session_ids:
+        target_id = stats["session_ids"][session_id] = target_session_id or new_session_id()
+        if target_id not in managers:
+            managers[target_id] = get_loaded_context_manager(target_id) or ContextManager(target_id)
+        manager = managers[target_id]
+        rows = _read_legacy_rows(source_dir, session_id)
+        stored = _read_legacy_embeddings(source_dir, session_id)
+
+        pairs, embeddings, entry_ids = [], [], []
+        for index, (query, response) in enumerate(rows):
+            if not query.strip():
+                continue
+            entry_id = f"import_{session_id}_{index + 1}"
+            if entry_id in manager.entries:
+                stats["skipped"] += 1
+                continue
+            document, vector = stored.get(index, (None, None))
+            if vector is not None and document == query:
+                stats["reused_embeddings"] += 1
+            else:
+                vector = None
+                missing.append((len(plans), len(pairs)))
+            pairs.append((query, response))
+            embeddings.append(vector)
+            entry_ids.append(entry_id)
+
+        if pairs:
+            plans.append((manager, pairs, embeddings, entry_ids))
+        stats["sessions"] += 1
+
+    if missing:
+        queries = [plans[plan][1][row][0] for plan, row in missing]
+        logger.info(f"Encoding {len(queries)} imported queries without a stored embedding...")
+        for (plan, row), vector in zip(missing, _encode_missing(queries, max_workers)):
+            plans[plan][2][row] = np.asarray(vector, dtype=np.float32)
+        stats["encoded"] = len(missing)
+
+    # Reused embeddings also seed the embedding cache so repeated questions skip the model
+    get_embedding_cache().put_many([
+        (normalize_text(query), vector)
+        for _, pairs, embeddings, _ in plans
+        for (query, _), vector in zip(pairs, embeddings)
+    ])
+
+    for manager, pairs, embeddings, entry_ids in plans:
+        manager.add_queries(pairs, embeddings=[vector.tolist() for vector in embeddings], entry_ids=entry_ids)
+        stats["rows"] += len(pairs)
+
+    logger.info(
+        f"Imported {stats['rows']} rows from {stats['sessions']} legacy session(s): "
+        f"{stats['reused_embeddings']} embeddings reused, {stats['encoded']} encoded, {stats['skipped']} already present."
+    )
+    return stats
+
+def resume_session(session_id: str) -> ContextManager:
+    """
+    Reopens a previous session by ID, restoring it from its context log. Its
+    Chroma collection is kept, so nothing is re-encoded.
+
+    Only IDs issued by `new_session_id()` can be resumed, since the ID is the
+    only thing protecting the session. Legacy sessions are never imported here;
+    use `python -m chat.session_history` to import them.
+
+    Args:
+        session_id (str): The ID of the session to reopen.
+
+    Returns:
+        ContextManager: The session's context manager, with its previous entries loaded.
+
+    Raises:
+        ValueError: If the ID was not issued by `new_session_id()`.
+        LookupError: If no session with this ID is stored.
+    """
+    if not isinstance(session_id, str) or not RESUMABLE_SESSION_ID_RE.match(session_id):
+        raise ValueError("Session ID is not resumable.")
+    if not os.path.exists(f"{context_manager.CONTEXT_LOG_DIR_BASE}_{session_id}.jsonl"):
+        raise LookupError("No stored session with this ID.")
+    manager = get_context_manager(session_id)
+    logger.info(f"Resumed session with {len(manager.entries)} context entries.")
+    return manager
+
+def main() -> None:
+    """
+    Imports legacy sessions from the command line, each into a new resumable session.
+
+    Run from the repository root:
+        python -m chat.session_history [--source-dir ./prev_chats] [session_id ...]
+    """
+    parser = argparse.ArgumentParser(description="Import legacy sessions into the context store.")
+    parser.add_argument("session_ids", nargs="*", help="legacy session IDs to import; all of them by default")
+    parser.add_argument("--source-dir", default=LEGACY_HISTORY_DIR)
+    args = parser.parse_args()
+
+    stats = import_legacy_sessions(args.source_dir, session_ids=args.session_ids or None)
+    for legacy_id, target_id in stats["session_ids"].items():
+        print(f"{legacy_id} -> ?session_id={target_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import logging
+import threading
+
+import numpy as np
+
+from chat.coin_matcher import match_coin_names
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Constants
+SIMILARITY_WEIGHT = 1.0  # Weight of the cosine similarity between the queries
+RECENCY_WEIGHT = 0.3  # Weight of the recency bonus, 1.0 for the latest turn
+COIN_OVERLAP_WEIGHT = 0.2  # Weight of the share of the query's coins the entry is about
+RECENCY_HALF_LIFE = 2  # Turns after which the recency bonus is halved
+INITIAL_CAPACITY = 32  # Rows allocated up front; the matrix doubles when full
+
+
+def entry_coins(query: str, previous: frozenset = frozenset()) -> frozenset:
+    """
+    Returns the coins a turn is about: those named in its query, or those of the
+    previous turn when it names none (e.g. "what about its price now?").
+    """
+    coins, _ = match_coin_names(query)
+    return frozenset(coins) if coins else previous
+
+
+class SessionIndex:
+    """
+    In-process vector index for one session's turns.
+
+    Query embeddings are kept as unit rows of a float32 matrix, so a search is a
+    single matrix-vector product. Entries are ranked by a blend of cosine
+    similarity, recency and coin overlap with the query, which lets a follow-up
+    like "what about its price now?" find the turn it refers to.
+    """
+
+    def __init__(self, similarity_weight: float = SIMILARITY_WEIGHT, recency_weight: float = RECENCY_WEIGHT,
+                 coin_weight: float = COIN_OVERLAP_WEIGHT, recency_half_life: float = RECENCY_HALF_LIFE):
+        self.similarity_weight = similarity_weight
+        self.recency_weight = recency_weight
+        self.coin_weight = coin_weight
+        self.recency_half_life = recency_half_life
+        self.entry_ids = []
+        self.coins = []
+        self._rows = {}
+        self._vectors = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entry_ids)
+
+    def add(self, entry_ids: list, vectors: list, queries: list) -> None:
+        """
+        Appends turns in conversation order. Entries already in the index are skipped.
+
+        Args:
+            entry_ids (list): The entry IDs of the turns.
+            vectors (list): Their query embeddings.
+            queries (list): Their query texts, used to tag each turn with its coins.
+        """
+        with self._lock:
+            for entry_id, vector, query in zip(entry_ids, vectors, queries):
+                if entry_id in self._rows:
+                    continue
+                vector = np.asarray(vector, dtype=np.float32)
+                if self._vectors is None:
+                    self._vectors = np.zeros((INITIAL_CAPACITY, len(vector)), dtype=np.float32)
+                elif len(self.entry_ids) == len(self._vectors):
+                    self._vectors = np.concatenate([self._vectors, np.zeros_like(self._vectors)])
+
+                row = len(self.entry_ids)
+                norm = np.linalg.norm(vector)
+                self._vectors[row] = vector / norm if norm else vector
+                self._rows[entry_id] = row
+                self.entry_ids.append(entry_id)
+                self.coins.append(entry_coins(query, self.coins[-1] if self.coins else frozenset()))
+
+    def scores(self, query_vector, query: str) -> np.ndarray:
+        """
+        Returns the blended score of every entry for a query, in insertion order.
+        """
+        with self._lock:
+            size = len(self.entry_ids)
+            if not size:
+                return np.zeros(0, dtype=np.float32)
+            vectors = self._vectors[:size]
+            coins = self.coins[:size]
+
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        similarity = vectors @ (query_vector / norm if norm else query_vector)
+
+        ages = np.arange(size - 1, -1, -1, dtype=np.float32)
+        recency = np.power(0.5, ages / self.recency_half_life)
+
+        query_coins = entry_coins(query, coins[-1])
+        overlap = np.zeros(size, dtype=np.float32)
+        if query_coins and self.coin_weight:
+            overlap[:] = [len(query_coins & entry) / len(query_coins) for entry in coins]
+
+        return self.similarity_weight * similarity + self.recency_weight * recency + self.coin_weight * overlap
+
+    def search(self, query_vector, query: str, top_k: int = 3) -> list:
+        """
+        Returns the IDs of the `top_k` best-scoring entries, best first.
+
+        Args:
+            query_vector: The embedding of the new query.
+            query (str): The new query, matched against each turn's coins.
+            top_k (int): The number of entries to return.
+
+        Returns:
+            list: Entry IDs.
+
+        Raises:
+            ValueError: If `top_k` is not positive.
+        """
+        if top_k <= 0:
+            raise ValueError(f"top_k must be positive, got {top_k}.")
+        scores = self.scores(query_vector, query)
+        if not len(scores):
+            return []
+        if top_k < len(scores):
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [self.entry_ids[row] for row in top]
@@ -1,28 +1,83 @@
 
 import streamlit as st
 import logging
-from chat.context_manager import add_query_to_context, retrieve_context_for_query
-from chat.query_processor import process_user_query
-from chat.llm_agent import generate_final_response
-from utils.translation import detect_and_translate
-import uuid
-from datetime import datetime
+from chat.pipeline import handle_query, stream_query
+from chat.context_manager import new_session_id, warmup
+from chat.session_history import resume_session
+from chat.retention import start_compaction_job
+from chat.coin_matcher import VALID_CRYPTOS
+from api.market_table import start_market_refresher
+from itertools import chain
 
 # Configure logger
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+# Render bot responses token by token as they are generated
+STREAM_RESPONSES = True
+# Load the embedding model in the background as soon as the app starts
+PRELOAD_MODELS = True
+# Keep all tracked coins in memory, refreshed by one bulk request at a fixed interval
+MARKET_REFRESHER = True
+# Periodically apply the retention policy to stored session context
+COMPACT_CONTEXT_STORE = True
+
 # Streamlit Page Configuration
 st.set_page_config(page_title="Chatbot", layout="wide")
 
-# Ensure a unique session ID for the user session
+@st.cache_resource
+def preload_models() -> None:
+    """
+    Starts loading the shared embedding model and vector store once per process.
+    """
+    warmup(background=True)
+
+if PRELOAD_MODELS:
+    preload_models()
+
+@st.cache_resource
+def start_market_data() -> None:
+    """
+    Starts the background market table refresher once per process.
+    """
+    start_market_refresher(VALID_CRYPTOS)
+
+if MARKET_REFRESHER:
+    start_market_data()
+
+@st.cache_resource
+def start_context_compaction() -> None:
+    """
+    Starts the background context store compaction job once per process.
+    """
+    start_compaction_job()
+
+if COMPACT_CONTEXT_STORE:
+    start_context_compaction()
+
+# Resume the session named in the URL, or start a new one and put its ID in the URL
 if "session_id" not in st.session_state:
-    st.session_state["session_id"] = f"session_{uuid.uuid4().hex[:8]}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    logger.info(f"Session ID initialized: {st.session_state['session_id']}")
+    resumed_id = st.query_params.get("session_id")
+    if resumed_id:
+        try:
+            st.session_state["chat_history"] = [
+                {"user": entry["query"], "bot": entry["response"]}
+                for entry in resume_session(resumed_id).entries.values()
+            ]
+            st.session_state["session_id"] = resumed_id
+            logger.info("Session resumed from URL.")
+        except Exception as e:
+            logger.warning(f"Could not resume session from URL; starting a new one: {e}")
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = new_session_id()
+        st.session_state["chat_history"] = []
+        st.query_params["session_id"] = st.session_state["session_id"]
+        logger.info("New session initialized.")
 
 # Initialize Session State for Context and Chat History
 if "chat_history" not in st.session_state:
     st.session_state["chat_history"] = []  # Holds the conversation
+if "context" not in st.session_state:
     st.session_state["context"] = None  # For persistent context during the session
 
 # Page Title
@@ -44,21 +99,8 @@ def handle_user_input(user_input: str) -> str:
         return ""
 
     try:
-        # Step 1: Translate user input to English if necessary
-        translated_query = detect_and_translate(user_input)
-        logger.info(f"Translated query: {translated_query}")
-
-        # Step 2: Retrieve context from past queries
-        context = retrieve_context_for_query(translated_query)  # Uses session-specific DB
-
-        # Step 3: Extract cryptocurrency data from API
-        coin_data = process_user_query(translated_query, context)
-
-        # Step 4: Generate response using LLM
-        final_response = generate_final_response(coin_data, translated_query)
-
-        # Step 5: Save query and response for context
-        add_query_to_context(translated_query, final_response)  # Uses session-specific DB
+        # Steps 1-5: Translate, retrieve context, fetch coin data, generate and save context
+        final_response = handle_query(user_input, st.session_state["session_id"])
 
         # Step 6: Append to chat history for display
         st.session_state["chat_history"].append({"user": user_input, "bot": final_response})
@@ -69,6 +111,35 @@ def handle_user_input(user_input: str) -> str:
         logger.error(f"Error handling user input: {e}", exc_info=True)
         return "I'm sorry, something went wrong. Please try again."
 
+def stream_user_input(user_input: str):
+    """
+    Handles the user input and streams the response as it is generated.
+
+    Args:
+        user_input (str): The user's input message.
+
+    Yields:
+        str: The next chunk of the bot's response.
+    """
+    if not isinstance(user_input, str) or not user_input.strip():
+        st.error("Invalid input. Please enter a valid query.")
+        return
+
+    chunks = []
+    try:
+        # Steps 1-5: Translate, retrieve context, fetch coin data, stream and save context
+        for chunk in stream_query(user_input, st.session_state["session_id"]):
+            chunks.append(chunk)
+            yield chunk
+    except Exception as e:
+        logger.error(f"Error handling user input: {e}", exc_info=True)
+        if not chunks:
+            chunks.append("I'm sorry, something went wrong. Please try again.")
+            yield chunks[-1]
+
+    # Step 6: Append to chat history for display
+    st.session_state["chat_history"].append({"user": user_input, "bot": "".join(chunks)})
+
 # Chat Interface
 st.write("### Chat with the Bot")
 
@@ -84,13 +155,21 @@ if prompt := st.chat_input("Type your message..."):
     with st.chat_message("user"):
         st.markdown(prompt)  # Display the user's message in the chat
 
-    # Generate and display bot response
-    with st.spinner("Generating response..."):
-        try:
-            response = handle_user_input(prompt)
-        except Exception as e:
-            response = "I'm sorry, something went wrong. Please try again."
-            st.error(f"Error: {str(e)}")
-
-    with st.chat_message("bot"):
-        st.markdown(response)  # Display the bot's response in the chat
+    if STREAM_RESPONSES:
+        # Keep the spinner up until the first token arrives, then render tokens live
+        stream = stream_user_input(prompt)
+        with st.chat_message("bot"):
+            with st.spinner("Generating response..."):
+                first_chunk = next(stream, "")
+            st.write_stream(chain([first_chunk], stream))
+    else:
+        # Generate and display bot response
+        with st.spinner("Generating response..."):
+            try:
+                response = handle_user_input(prompt)
+            except Exception as e:
+                response = "I'm sorry, something went wrong. Please try again."
+                st.error(f"Error: {str(e)}")
+
+        with st.chat_message("bot"):
+            st.markdown(response)  # Display the bot's response in the chat
@@ -0,0 +1,141 @@
+import logging
+import threading
+from contextlib import contextmanager
+from time import monotonic
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Constants
+MAX_CONCURRENT_REQUESTS = 16  # User requests processed at the same time across all sessions
+MAX_QUEUED_REQUESTS = 32  # User requests allowed to wait for a slot; further ones are shed immediately
+REQUEST_QUEUE_TIMEOUT = 15  # Longest a user request waits for a slot before it is shed (in seconds)
+UPSTREAM_QUEUE_TIMEOUT = 10  # Longest a call waits for an upstream slot (in seconds)
+
+# Concurrent calls allowed per upstream service, across all sessions
+UPSTREAM_CONCURRENCY = {
+    "api.coincap.io": 8,
+    "api.lecto.ai": 4,
+    "together": 8,
+}
+DEFAULT_UPSTREAM_CONCURRENCY = 8
+
+# Shown to the user when a request is shed
+OVERLOADED_MESSAGE = "The assistant is handling a lot of requests right now. Please try again in a few seconds."
+
+
+class OverloadedError(Exception):
+    """
+    Raised when no slot frees up in time, or the wait queue is already full.
+    """
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the number of concurrent holders, with a bounded, time-limited wait queue.
+
+    Callers wait up to `timeout` seconds for a slot. When `max_waiting` callers are
+    already waiting, new callers are rejected immediately instead of queueing.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, timeout: float, max_waiting: int = None):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.waiting = 0
+        self.stats = {"admitted": 0, "rejected_queue_full": 0, "rejected_timeout": 0, "wait_total": 0.0, "wait_max": 0.0}
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: float = None) -> None:
+        """
+        Waits for a slot.
+
+        Raises:
+            OverloadedError: If the wait queue is full or no slot frees up in time.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = monotonic()
+        with self._condition:
+            if self.active >= self.max_concurrent and self.max_waiting is not None and self.waiting >= self.max_waiting:
+                self.stats["rejected_queue_full"] += 1
+                raise OverloadedError(f"{self.name}: queue full ({self.waiting} waiting)")
+            self.waiting += 1
+            try:
+                admitted = self._condition.wait_for(lambda: self.active < self.max_concurrent, timeout)
+            finally:
+                self.waiting -= 1
+            if not admitted:
+                self.stats["rejected_timeout"] += 1
+                raise OverloadedError(f"{self.name}: no slot free after {timeout}s")
+            self.active += 1
+            waited = monotonic() - start
+            self.stats["admitted"] += 1
+            self.stats["wait_total"] += waited
+            self.stats["wait_max"] = max(self.stats["wait_max"], waited)
+
+    def release(self) -> None:
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self, timeout: float = None):
+        """
+        Holds a slot for the duration of the `with` block.
+        """
+        self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def get_stats(self) -> dict:
+        with self._condition:
+            stats = dict(self.stats)
+            stats["active"] = self.active
+            stats["waiting"] = self.waiting
+        stats["limit"] = self.max_concurrent
+        stats["wait_avg"] = stats["wait_total"] / stats["admitted"] if stats["admitted"] else 0.0
+        return stats
+
+
+# Gate in front of the whole pipeline
+request_limiter = ConcurrencyLimiter("requests", MAX_CONCURRENT_REQUESTS, REQUEST_QUEUE_TIMEOUT, MAX_QUEUED_REQUESTS)
+
+_upstream_limiters = {}
+_upstream_lock = threading.Lock()
+
+def get_upstream_limiter(upstream: str) -> ConcurrencyLimiter:
+    """
+    Returns the shared limiter for an upstream service, e.g. a host name or "together".
+    """
+    with _upstream_lock:
+        limiter = _upstream_limiters.get(upstream)
+        if limiter is None:
+            limit = UPSTREAM_CONCURRENCY.get(upstream, DEFAULT_UPSTREAM_CONCURRENCY)
+            limiter = ConcurrencyLimiter(upstream, limit, UPSTREAM_QUEUE_TIMEOUT)
+            _upstream_limiters[upstream] = limiter
+        return limiter
+
+def upstream_slot(upstream: str):
+    """
+    Holds one of the upstream's concurrency slots for the duration of a `with` block.
+
+    Raises:
+        OverloadedError: If no slot frees up within UPSTREAM_QUEUE_TIMEOUT.
+    """
+    return get_upstream_limiter(upstream).slot()
+
+def get_admission_stats() -> dict:
+    """
+    Returns admission counters for user requests and every upstream.
+
+    Returns:
+        dict: A mapping of limiter name to its admitted, rejected, active and waiting counts and wait times.
+    """
+    with _upstream_lock:
+        limiters = [request_limiter] + list(_upstream_limiters.values())
+    return {limiter.name: limiter.get_stats() for limiter in limiters}
@@ -0,0 +1,260 @@
+import random
+import threading
+import logging
+from time import sleep, monotonic
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from utils.admission import OverloadedError, get_upstream_limiter
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_TIMEOUT = 10  # Timeout for each request (in seconds)
+DEFAULT_MAX_RETRIES = 3  # Total attempts per call, including the first one
+BACKOFF_BASE = 0.25  # First retry delay (in seconds), doubled on every retry
+BACKOFF_MAX = 2.0  # Upper bound for a single retry delay (in seconds)
+POOL_CONNECTIONS = 4  # Number of connection pools cached per session
+DEFAULT_POOL_MAXSIZE = 10  # Keep-alive connections kept open per host
+CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive failures before the circuit opens
+CIRCUIT_RESET_TIMEOUT = 30  # Time before an open circuit lets a trial call through (in seconds)
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Per-host pool sizes; hosts not listed use DEFAULT_POOL_MAXSIZE
+HOST_POOL_SIZES = {
+    "api.coincap.io": 20,
+    "api.lecto.ai": 10,
+}
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    Raised when a call is rejected because the circuit for its host is open.
+    """
+
+
+class HostBusyError(requests.exceptions.RequestException, OverloadedError):
+    """
+    Raised when every concurrency slot for a host stays taken for too long.
+    """
+
+
+class CircuitBreaker:
+    """
+    Tracks consecutive failures for one host and fails fast while the host is down.
+
+    The circuit opens after `failure_threshold` consecutive failures. Once
+    `reset_timeout` seconds have passed a single trial call is let through;
+    success closes the circuit again, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow_request(self) -> bool:
+        """
+        Returns True if a call may go out, reserving the trial slot when half-open.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if monotonic() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = monotonic()
+
+
+# Shared state: one session, breaker and metrics record per host
+_sessions = {}
+_breakers = {}
+_metrics = {}
+_state_lock = threading.Lock()
+
+
+def _new_metrics() -> dict:
+    return {
+        "requests": 0,
+        "successes": 0,
+        "failures": 0,
+        "retries": 0,
+        "rejected": 0,
+        "latency_total": 0.0,
+        "latency_max": 0.0,
+    }
+
+
+def _host_state(host: str):
+    with _state_lock:
+        if host not in _sessions:
+            pool_size = HOST_POOL_SIZES.get(host, DEFAULT_POOL_MAXSIZE)
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=pool_size, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[host] = session
+            _breakers[host] = CircuitBreaker()
+            _metrics[host] = _new_metrics()
+            logger.info(f"Created pooled HTTP session for {host} (pool size {pool_size}).")
+        return _sessions[host], _breakers[host], _metrics[host]
+
+
+def _record(metrics: dict, **increments) -> None:
+    with _state_lock:
+        for key, value in increments.items():
+            metrics[key] += value
+
+
+def _record_latency(metrics: dict, elapsed: float) -> None:
+    with _state_lock:
+        metrics["latency_total"] += elapsed
+        metrics["latency_max"] = max(metrics["latency_max"], elapsed)
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Returns a jittered exponential backoff delay for the given retry attempt.
+
+    Args:
+        attempt (int): The retry number, starting at 1.
+
+    Returns:
+        float: The delay in seconds, drawn uniformly from [0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))].
+    """
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)))
+
+
+def get_session(url: str) -> requests.Session:
+    """
+    Returns the shared keep-alive session for the host of the given URL.
+    """
+    return _host_state(urlsplit(url).netloc)[0]
+
+
+def request(method: str, url: str, max_retries: int = DEFAULT_MAX_RETRIES, timeout: float = DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+    """
+    Sends an HTTP request through the pooled session for its host.
+
+    Connection errors, timeouts and retryable status codes are retried with
+    jittered exponential backoff. Other HTTP errors are raised immediately.
+
+    The backoff sleeps on the calling thread, so this is a blocking call. The
+    pipeline runs it in worker threads (`asyncio.to_thread`), so a backoff holds
+    only that request's worker, not the event loop or other requests. The host's
+    concurrency slot is released before sleeping.
+
+    Args:
+        method (str): The HTTP method, e.g. "GET" or "POST".
+        url (str): The request URL.
+        max_retries (int): Total attempts, including the first one.
+        timeout (float): Timeout for each attempt (in seconds).
+        **kwargs: Passed through to `requests.Session.request`.
+
+    Returns:
+        requests.Response: A successful response.
+
+    Raises:
+        CircuitOpenError: If the host's circuit is open.
+        HostBusyError: If no concurrency slot for the host frees up in time.
+        requests.exceptions.RequestException: If every attempt fails.
+    """
+    host = urlsplit(url).netloc
+    session, breaker, metrics = _host_state(host)
+    limiter = get_upstream_limiter(host)
+
+    attempt = 0
+    while True:
+        # Cap concurrent calls to the host across all sessions. The slot is taken
+        # before the breaker check so a busy host can't strand a half-open trial.
+        try:
+            limiter.acquire()
+        except OverloadedError as e:
+            _record(metrics, rejected=1)
+            raise HostBusyError(str(e)) from e
+
+        if not breaker.allow_request():
+            limiter.release()
+            _record(metrics, rejected=1)
+            raise CircuitOpenError(f"Circuit open for {host}; failing fast.")
+
+        attempt += 1
+        _record(metrics, requests=1)
+        start = monotonic()
+        try:
+            try:
+                response = session.request(method, url, timeout=timeout, **kwargs)
+            finally:
+                limiter.release()
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                response.raise_for_status()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.HTTPError) as e:
+            _record_latency(metrics, monotonic() - start)
+            _record(metrics, failures=1)
+            breaker.record_failure()
+            if attempt >= max_retries:
+                logger.error(f"{method} {url} failed after {attempt} attempts: {e}")
+                raise
+            delay = backoff_delay(attempt)
+            _record(metrics, retries=1)
+            logger.warning(f"{method} {url} failed ({e}); retrying in {delay:.2f} seconds...")
+            sleep(delay)
+            continue
+        except requests.exceptions.RequestException as e:
+            # Not worth retrying (e.g. InvalidURL, ChunkedEncodingError), but it must
+            # still settle the breaker, or a half-open trial would stay reserved
+            _record_latency(metrics, monotonic() - start)
+            _record(metrics, failures=1)
+            breaker.record_failure()
+            logger.error(f"{method} {url} failed: {e}")
+            raise
+
+        _record_latency(metrics, monotonic() - start)
+        # Non-retryable client errors mean the host is up, so they don't trip the breaker
+        breaker.record_success()
+        response.raise_for_status()
+        _record(metrics, successes=1)
+        return response
+
+
+def get_transport_metrics() -> dict:
+    """
+    Returns per-host request, retry and latency metrics.
+
+    Returns:
+        dict: A mapping of host to its counters, average latency and circuit state.
+    """
+    with _state_lock:
+        snapshot = {host: dict(metrics) for host, metrics in _metrics.items()}
+    for host, metrics in snapshot.items():
+        metrics["latency_avg"] = metrics["latency_total"] / metrics["requests"] if metrics["requests"] else 0.0
+        metrics["circuit_state"] = _breakers[host].state
+    return snapshot
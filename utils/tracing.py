@@ -0,0 +1,234 @@
+import json
+import uuid
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from time import perf_counter
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Constants
+TRACE_HISTORY_SIZE = 200  # Number of finished traces kept for export
+SPAN_SAMPLE_SIZE = 1000  # Most recent durations kept per stage for percentiles
+TRACE_LOG_PATH = None  # Set to a file path (e.g. "./traces.jsonl") to append every finished trace as JSON
+METRIC_NAME = "chatbot_stage_duration_seconds"
+
+# Histogram bucket upper bounds (in seconds)
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Trace of the request currently being handled; copied into worker threads by asyncio.to_thread
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+_recent_traces = deque(maxlen=TRACE_HISTORY_SIZE)
+_stage_metrics = {}  # stage -> {"buckets": [...], "count", "sum", "samples": deque}
+_metrics_lock = threading.Lock()
+
+
+class Trace:
+    """
+    Timed spans recorded while handling one request.
+
+    Spans may be added from several threads; offsets are relative to the start of the trace.
+    """
+
+    def __init__(self, name: str, **attrs):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attrs = attrs
+        self.started_at = datetime.now(timezone.utc)
+        self.duration = None
+        self.spans = []
+        self._start = perf_counter()
+        self._lock = threading.Lock()
+
+    def add_span(self, record: dict) -> None:
+        with self._lock:
+            self.spans.append(record)
+
+    def to_dict(self) -> dict:
+        """
+        Returns the trace as a JSON-serializable dict.
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda record: record["start"])
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "attrs": self.attrs,
+            "started_at": self.started_at.isoformat(),
+            "duration": self.duration,
+            "spans": spans,
+        }
+
+
+def _observe(stage: str, duration: float) -> None:
+    with _metrics_lock:
+        metrics = _stage_metrics.get(stage)
+        if metrics is None:
+            metrics = {
+                "buckets": [0] * len(HISTOGRAM_BUCKETS),
+                "count": 0,
+                "sum": 0.0,
+                "samples": deque(maxlen=SPAN_SAMPLE_SIZE),
+            }
+            _stage_metrics[stage] = metrics
+        for index, bound in enumerate(HISTOGRAM_BUCKETS):
+            if duration <= bound:
+                metrics["buckets"][index] += 1
+        metrics["count"] += 1
+        metrics["sum"] += duration
+        metrics["samples"].append(duration)
+
+def current_trace():
+    """
+    Returns the trace of the request being handled, or None outside of a trace.
+    """
+    return _current_trace.get()
+
+@contextmanager
+def span(stage: str, **attrs):
+    """
+    Times a pipeline stage, recording it in the stage histograms and, inside a
+    trace, as a span of that trace. Attributes may be added to the yielded dict.
+
+    Args:
+        stage (str): The stage name, e.g. "translate" or "coincap_fetch".
+        **attrs: Attributes stored with the span.
+
+    Yields:
+        dict: The span's attributes.
+    """
+    trace = _current_trace.get()
+    start = perf_counter()
+    error = None
+    try:
+        yield attrs
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration = perf_counter() - start
+        _observe(stage, duration)
+        if trace is not None:
+            record = {"stage": stage, "start": start - trace._start, "duration": duration, "attrs": attrs}
+            if error:
+                record["error"] = error
+            trace.add_span(record)
+
+def _finish_trace(trace: Trace) -> None:
+    trace.duration = perf_counter() - trace._start
+    _observe(trace.name, trace.duration)
+    _recent_traces.append(trace)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Trace: {json.dumps(trace.to_dict(), default=str)}")
+    if TRACE_LOG_PATH:
+        try:
+            with open(TRACE_LOG_PATH, "a") as f:
+                f.write(json.dumps(trace.to_dict(), default=str) + "\n")
+        except OSError as e:
+            logger.error(f"Error writing trace log: {e}")
+
+@contextmanager
+def start_trace(name: str, **attrs):
+    """
+    Starts a trace for one request. Spans opened in this context, including in
+    worker threads started with asyncio.to_thread, are attached to it.
+
+    Args:
+        name (str): The request kind, e.g. "query". Its total duration is recorded under this stage name.
+        **attrs: Attributes stored with the trace, e.g. the session ID.
+
+    Yields:
+        Trace: The new trace.
+    """
+    trace = Trace(name, **attrs)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # Finished from another context, e.g. an abandoned streaming generator
+            pass
+        _finish_trace(trace)
+
+def get_recent_traces(limit: int = None) -> list:
+    """
+    Returns the most recently finished traces as JSON-serializable dicts, newest last.
+
+    Args:
+        limit (int): Maximum number of traces returned. Returns all kept traces if None.
+    """
+    traces = list(_recent_traces)
+    if limit is not None:
+        traces = traces[-limit:]
+    return [trace.to_dict() for trace in traces]
+
+def export_traces_json(limit: int = None) -> str:
+    """
+    Returns the most recently finished traces as a JSON array.
+    """
+    return json.dumps(get_recent_traces(limit), default=str)
+
+def _percentile(sorted_samples: list, fraction: float) -> float:
+    index = min(len(sorted_samples) - 1, int(fraction * len(sorted_samples)))
+    return sorted_samples[index]
+
+def get_stage_stats() -> dict:
+    """
+    Returns latency statistics per stage.
+
+    Returns:
+        dict: A mapping of stage name to its count, mean, and p50/p95/p99 over the
+        most recent SPAN_SAMPLE_SIZE durations (in seconds).
+    """
+    with _metrics_lock:
+        snapshot = {
+            stage: (metrics["count"], metrics["sum"], sorted(metrics["samples"]))
+            for stage, metrics in _stage_metrics.items()
+        }
+    stats = {}
+    for stage, (count, total, samples) in snapshot.items():
+        stats[stage] = {
+            "count": count,
+            "mean": total / count if count else 0.0,
+            "p50": _percentile(samples, 0.50) if samples else 0.0,
+            "p95": _percentile(samples, 0.95) if samples else 0.0,
+            "p99": _percentile(samples, 0.99) if samples else 0.0,
+        }
+    return stats
+
+def export_prometheus() -> str:
+    """
+    Returns the stage latency histograms in the Prometheus text exposition format.
+    """
+    with _metrics_lock:
+        snapshot = {
+            stage: (list(metrics["buckets"]), metrics["count"], metrics["sum"])
+            for stage, metrics in _stage_metrics.items()
+        }
+    lines = [
+        f"# HELP {METRIC_NAME} Time spent in each chatbot pipeline stage.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    for stage, (buckets, count, total) in sorted(snapshot.items()):
+        for bound, bucket_count in zip(HISTOGRAM_BUCKETS, buckets):
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bound}"}} {bucket_count}')
+        lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+        lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {total}')
+        lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+def reset_stage_metrics() -> None:
+    """
+    Drops all recorded stage metrics and traces.
+    """
+    with _metrics_lock:
+        _stage_metrics.clear()
+    _recent_traces.clear()
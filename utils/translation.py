@@ -1,7 +1,13 @@
 
 
+import re
+import asyncio
 import requests
 import logging
+import threading
+from collections import OrderedDict
+from utils import http_client
+from utils.tracing import span
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -9,26 +15,97 @@ logger = logging.getLogger(__name__)
 
 # API key for Lecto
 LECTO_API_KEY = "LECTO_API_KEY" # please use my lecto api key listed down for language translation
+LECTO_URL = "https://api.lecto.ai/v1/translate/text"
+MAX_RETRIES = 2  # Number of attempts per call
+TIMEOUT = 10  # Timeout for each request (in seconds)
+TRANSLATION_CACHE_MAX_SIZE = 1024  # Maximum number of translations kept in memory
+ENGLISH_WORD_RATIO = 0.6  # Minimum share of known English words for text to skip the API
 
-def detect_and_translate(text: str, target_language: str = "en") -> str:
+# Common English words; text made mostly of these is treated as English
+ENGLISH_WORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between
+both but by can could did do does doing done down during each either else ever every few for from
+further get give had has have having he hello her here hers hey hi him his how i if in into is it its
+just know last less let like many me mention mentioned more most much my need no not now of off on
+once only or other our out over own please previously same say she should show so some such tell
+than thank thanks that the their them then there these they this those through till to today too
+under until up very want wanted was we well were what when where which while who whom why will with
+would yes yesterday you your
+whats hows whos thats dont doesnt cant wont im ive youre lets
+price prices rank ranks ranking symbol symbols market cap value worth info information details compare
+comparison difference between current currently latest top high low change volume supply trend
+crypto cryptos cryptocurrency cryptocurrencies currency currencies coin coins token tokens
+bitcoin btc ethereum eth tether usdt solana sol tron trx cardano ada dogecoin doge ripple xrp
+litecoin ltc polkadot dot binance bnb avalanche polygon chainlink stellar monero
+joke jokes used use mean means what's good bad new old one two three four five ten
+""".split())
+
+# Function words common in the non-English (often romanized) text our users send
+NON_ENGLISH_MARKERS = frozenset("""
+hai hain kya ka ki ke ko se mujhe muze mera meri uska uski iska kaise kitna batao dedo nahi aur bhi
+el la los las es que por para precio cual como del una
+le les est quel quelle prix des une avec pour
+der die das ist wie viel preis und ein eine
+o os qual preço quanto um
+""".split())
+
+_WORD_RE = re.compile(r"[a-z']+")
+
+# Translation cache: (text, target language) -> translated text, kept in LRU order
+_translation_cache = OrderedDict()
+_translation_cache_lock = threading.Lock()
+_translation_stats = {"english_fast_path": 0, "cache_hits": 0, "api_calls": 0, "api_texts": 0}
+
+def is_probably_english(text: str) -> bool:
     """
-    Detects the language of the given text and translates it to English if necessary.
+    Guesses locally whether text is English, without calling the translation API.
+
+    The guess is conservative: text is only treated as English when it has no
+    non-ASCII letters, no common non-English function words, and at least
+    ENGLISH_WORD_RATIO of its words are known English words.
 
     Args:
-        text (str): The input text to be checked and translated.
-        target_language (str): The language to translate the text into. Defaults to English ("en").
+        text (str): The text to check.
 
     Returns:
-        str: The translated text in the target language.
+        bool: True if the text can skip translation into English.
     """
-    if not isinstance(text, str) or not text.strip():
-        logger.warning("Invalid input text provided for translation.")
-        return ""  # Return empty string if input is invalid
+    if any(char.isalpha() and not char.isascii() for char in text):
+        return False
+    words = [word.strip("'").replace("'", "") for word in _WORD_RE.findall(text.lower())]
+    words = [word for word in words if word]
+    if not words:
+        # Numbers, symbols or emoji only; nothing to translate
+        return True
+    if any(word in NON_ENGLISH_MARKERS for word in words):
+        return False
+    known = sum(1 for word in words if word in ENGLISH_WORDS or word.rstrip("s") in ENGLISH_WORDS)
+    return known / len(words) >= ENGLISH_WORD_RATIO
+
+def _get_cached_translation(key: tuple):
+    with _translation_cache_lock:
+        translated = _translation_cache.get(key)
+        if translated is not None:
+            _translation_cache.move_to_end(key)
+            _translation_stats["cache_hits"] += 1
+        return translated
+
+def _store_translation(key: tuple, translated: str) -> None:
+    with _translation_cache_lock:
+        _translation_cache[key] = translated
+        _translation_cache.move_to_end(key)
+        while len(_translation_cache) > TRANSLATION_CACHE_MAX_SIZE:
+            _translation_cache.popitem(last=False)
 
-    # API endpoint for Lecto
-    url = "https://api.lecto.ai/v1/translate/text"
+def _request_translations(texts: list, target_language: str) -> list:
+    """
+    Translates texts in one Lecto request.
+
+    Returns:
+        list: The translations in input order, or None if the request failed or the response was malformed.
+    """
     payload = {
-        "texts": [text],  # Wrap the text in a list as per the API spec
+        "texts": texts,
         "to": [target_language],
     }
     headers = {
@@ -38,19 +115,111 @@ def detect_and_translate(text: str, target_language: str = "en") -> str:
     }
 
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
+        with _translation_cache_lock:
+            _translation_stats["api_calls"] += 1
+            _translation_stats["api_texts"] += len(texts)
+        with span("lecto_request", texts=len(texts)):
+            response = http_client.request(
+                "POST", LECTO_URL, json=payload, headers=headers, max_retries=MAX_RETRIES, timeout=TIMEOUT
+            )
         translation_result = response.json()
 
-        # Extract the translated text properly
+        # Extract the translated texts properly
         translations = translation_result.get("translations", [])
-        if translations and isinstance(translations[0], str):
-            logger.info("Translation successful.")
-            return translations[0].strip()
-        else:
-            logger.warning("Unexpected response format from Lecto API: %s", translation_result)
-            return text.strip()  # Fallback to the original text
+        if len(translations) == len(texts) and all(isinstance(t, str) for t in translations):
+            logger.info(f"Translation successful for {len(texts)} text(s).")
+            return [t.strip() for t in translations]
+        logger.warning("Unexpected response format from Lecto API: %s", translation_result)
+        return None
 
     except requests.exceptions.RequestException as e:
         logger.error(f"Error during translation: {e}", exc_info=True)
-        return text.strip()
+        return None
+
+def translate_texts(texts: list, target_language: str = "en") -> list:
+    """
+    Translates several texts, sending all of those that need it in a single Lecto request.
+
+    English texts (when translating into English) and previously translated texts
+    are answered locally. Texts that fail to translate are returned unchanged.
+
+    Args:
+        texts (list): The texts to translate.
+        target_language (str): The language to translate the texts into. Defaults to English ("en").
+
+    Returns:
+        list: The translated texts, in input order.
+    """
+    results = [text.strip() for text in texts]
+    pending = {}  # stripped text -> indexes in `texts`
+    for index, text in enumerate(results):
+        if not text:
+            continue
+        if target_language == "en" and is_probably_english(text):
+            with _translation_cache_lock:
+                _translation_stats["english_fast_path"] += 1
+            continue
+        cached = _get_cached_translation((text, target_language))
+        if cached is not None:
+            results[index] = cached
+            continue
+        pending.setdefault(text, []).append(index)
+
+    if not pending:
+        return results
+
+    translations = _request_translations(list(pending), target_language)
+    if translations is None:
+        return results
+    for (text, indexes), translated in zip(pending.items(), translations):
+        _store_translation((text, target_language), translated)
+        for index in indexes:
+            results[index] = translated
+    return results
+
+def detect_and_translate(text: str, target_language: str = "en") -> str:
+    """
+    Detects the language of the given text and translates it to English if necessary.
+
+    Args:
+        text (str): The input text to be checked and translated.
+        target_language (str): The language to translate the text into. Defaults to English ("en").
+
+    Returns:
+        str: The translated text in the target language.
+    """
+    if not isinstance(text, str) or not text.strip():
+        logger.warning("Invalid input text provided for translation.")
+        return ""  # Return empty string if input is invalid
+
+    with span("translate"):
+        return translate_texts([text], target_language)[0]
+
+async def detect_and_translate_async(text: str, target_language: str = "en") -> str:
+    """
+    Async variant of `detect_and_translate`.
+
+    Args:
+        text (str): The input text to be checked and translated.
+        target_language (str): The language to translate the text into. Defaults to English ("en").
+
+    Returns:
+        str: The translated text in the target language.
+    """
+    if isinstance(text, str) and target_language == "en" and is_probably_english(text.strip()):
+        # Answered locally; skip the worker thread hop
+        return detect_and_translate(text, target_language)
+    return await asyncio.to_thread(detect_and_translate, text, target_language)
+
+def get_translation_stats() -> dict:
+    """
+    Returns translation counters.
+
+    Returns:
+        dict: Texts answered by the English fast path, cache hits, Lecto calls,
+        texts sent to Lecto and current cache size.
+    """
+    with _translation_cache_lock:
+        stats = dict(_translation_stats)
+        stats["cache_size"] = len(_translation_cache)
+    return stats